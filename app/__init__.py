@@ -1,7 +1,11 @@
-from flask import Flask
+import os
+from importlib import import_module
+from threading import Lock
+from flask import Flask, render_template
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from dotenv import load_dotenv
+from jinja2 import ChoiceLoader
 
 load_dotenv()
 
@@ -9,13 +13,98 @@ login_manager = LoginManager()
 
 db = SQLAlchemy()
 
+MODELS = (
+    'app.models.user',
+    'app.models.subject',
+    'app.models.chapter',
+    'app.models.quiz',
+    'app.models.question',
+    'app.models.score',
+    'app.models.user_progress',
+    'app.models.report_job',
+    'app.models.open_attempt',
+    'app.models.bulk_job',
+)
+
+BLUEPRINTS = (
+    ('app.controllers.auth_controller', 'auth_bp'),
+    ('app.controllers.users_controller', 'users_bp'),
+    ('app.controllers.admin_controller', 'admin_bp'),
+)
+
+def load_models():
+    for module in MODELS:
+        import_module(module)
+
+def register_blueprints(app):
+    for module, name in BLUEPRINTS:
+        app.register_blueprint(getattr(import_module(module), name))
+
+class LazyBlueprintLoader:
+    # Imports the controllers (and with them the models and WTForms) on the
+    # first request instead of at startup, so CLI commands and freshly spawned
+    # workers don't pay for code they never run.
+    def __init__(self, app):
+        self.app = app
+        self.wsgi_app = app.wsgi_app
+        self.loaded = False
+        self.lock = Lock()
+
+    def __call__(self, environ, start_response):
+        if not self.loaded:
+            with self.lock:
+                if not self.loaded:
+                    register_blueprints(self.app)
+                    self.loaded = True
+        return self.wsgi_app(environ, start_response)
+
+@login_manager.user_loader
+def load_user(user_id):
+    from app.models.user import User
+    return db.session.get(User, user_id)
+
 def create_app():
     app = Flask(__name__)
     app.config.from_object('config.settings.Config')
-    
+
+    from app.templating import PrecompiledLoader, init_templating
+
+    precompiled_dir = app.config.get('PRECOMPILED_TEMPLATES_DIR')
+    if precompiled_dir and os.path.isdir(precompiled_dir):
+        source_loader = app.create_global_jinja_loader()
+        app.jinja_options = dict(
+            app.jinja_options,
+            loader=ChoiceLoader([PrecompiledLoader(precompiled_dir, source_loader), source_loader])
+        )
+
+    init_templating(app)
+
     db.init_app(app)
 
+    from app.cache import cache
+    cache.init_app(app)
+
     login_manager.init_app(app)
 
-    return app
+    from app.admission import init_admission
+    init_admission(app)
+
+    from app.request_logging import init_logging
+    init_logging(app)
 
+    @app.route("/")
+    def home():
+        return render_template("home.html")
+
+    if app.config.get('LAZY_LOADING'):
+        # url_for() to blueprint endpoints only works once the first request
+        # has been served in this mode.
+        app.wsgi_app = LazyBlueprintLoader(app)
+    else:
+        load_models()
+        register_blueprints(app)
+
+    from config.commands import register_commands
+    register_commands(app)
+
+    return app
@@ -0,0 +1,202 @@
+import math
+import os
+import sqlite3
+import time
+from collections import Counter, OrderedDict
+from functools import wraps
+from threading import BoundedSemaphore, Lock, local
+from flask import abort, current_app, make_response, request
+from flask_login import current_user
+
+# A bucket that has refilled to capacity behaves exactly like a missing one,
+# so both stores drop buckets once they are full again. Keys can contain
+# client-supplied usernames, and this keeps them from growing without bound.
+PRUNE_EVERY = 1000
+
+class MemoryBucketStore:
+    def __init__(self, max_entries=100000):
+        self.lock = Lock()
+        self.buckets = OrderedDict()
+        self.max_entries = max_entries
+        self.takes = 0
+
+    def _prune(self, now):
+        for key in [key for key, (_, _, full_at) in self.buckets.items() if full_at <= now]:
+            del self.buckets[key]
+
+    def take(self, key, capacity, period, now):
+        with self.lock:
+            tokens, updated, _ = self.buckets.get(key, (capacity, now, now))
+            tokens, retry_after = _refill_and_take(tokens, updated, capacity, period, now)
+            self.buckets[key] = (tokens, now, _full_at(tokens, capacity, period, now))
+            self.buckets.move_to_end(key)
+            self.takes += 1
+            if self.takes % PRUNE_EVERY == 0:
+                self._prune(now)
+            # Over the cap between sweeps: forget the least recently used
+            # bucket, which is O(1) unlike the full sweep
+            while len(self.buckets) > self.max_entries:
+                self.buckets.popitem(last=False)
+            return retry_after
+
+class SQLiteBucketStore:
+    # Shares buckets between every worker process on the host through one
+    # small SQLite file; BEGIN IMMEDIATE serialises the read-modify-write.
+    def __init__(self, path):
+        self.path = path
+        self.local = local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.takes = 0
+        connection = self._connect()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS token_buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, "
+            "updated REAL NOT NULL, full_at REAL NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS ix_token_buckets_full_at ON token_buckets (full_at)")
+
+    def _connect(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self.local.connection = connection
+        return connection
+
+    def take(self, key, capacity, period, now):
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT tokens, updated FROM token_buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens, retry_after = _refill_and_take(tokens, updated, capacity, period, now)
+            connection.execute(
+                "INSERT INTO token_buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated, "
+                "full_at = excluded.full_at",
+                (key, tokens, now, _full_at(tokens, capacity, period, now))
+            )
+            self.takes += 1
+            if self.takes % PRUNE_EVERY == 0:
+                connection.execute("DELETE FROM token_buckets WHERE full_at <= ?", (now,))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return retry_after
+
+def _refill_and_take(tokens, updated, capacity, period, now):
+    rate = capacity / period
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / rate
+
+def _full_at(tokens, capacity, period, now):
+    return now + (capacity - tokens) * period / capacity
+
+class AdmissionMetrics:
+    def __init__(self):
+        self.lock = Lock()
+        self.outcomes = Counter()
+        self.queue_wait_ms = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def record(self, endpoint, outcome):
+        with self.lock:
+            self.outcomes[(endpoint, outcome)] += 1
+
+    def enter(self, endpoint, waited):
+        with self.lock:
+            self.queue_wait_ms[endpoint] += waited * 1000
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def snapshot(self):
+        with self.lock:
+            endpoints = {}
+            for (endpoint, outcome), count in self.outcomes.items():
+                endpoints.setdefault(endpoint, {})[outcome] = count
+            for endpoint, waited in self.queue_wait_ms.items():
+                endpoints.setdefault(endpoint, {})["queue_wait_ms"] = waited
+            return {
+                "endpoints": endpoints,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+            }
+
+class AdmissionControl:
+    def __init__(self, config):
+        self.enabled = config.get("RATE_LIMIT_ENABLED", True)
+        self.limits = config.get("RATE_LIMITS", {})
+        if config.get("RATE_LIMIT_STORAGE") == "sqlite":
+            self.store = SQLiteBucketStore(config["RATE_LIMIT_SQLITE_PATH"])
+        else:
+            self.store = MemoryBucketStore(config.get("RATE_LIMIT_MAX_BUCKETS", 100000))
+        self.slots = BoundedSemaphore(config.get("MAX_CONCURRENT_HEAVY_REQUESTS", 8))
+        self.queue_timeout = config.get("HEAVY_REQUEST_QUEUE_TIMEOUT", 2)
+        self.metrics = AdmissionMetrics()
+
+    def check_limits(self, endpoint):
+        limits = self.limits.get(endpoint, {})
+        keys = [("ip", request.remote_addr)]
+        if current_user.is_authenticated:
+            keys.append(("user", current_user.id))
+        elif request.form.get("username"):
+            keys.append(("user", request.form["username"].lower()))
+        now = time.time()
+        retry_after = 0
+        for kind, value in keys:
+            if kind not in limits:
+                continue
+            capacity, period = limits[kind]
+            retry_after = self.store.take(f"{endpoint}:{kind}:{value}", capacity, period, now)
+            if retry_after:
+                # Don't create per-username buckets for requests the IP
+                # bucket already turned away
+                return retry_after
+        return retry_after
+
+def init_admission(app):
+    app.extensions["admission"] = AdmissionControl(app.config)
+
+def _reject(status, message, retry_after):
+    response = make_response(message, status)
+    response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    abort(response)
+
+def admission_controlled(methods=("POST",), heavy=True):
+    def decorator(func):
+        @wraps(func)
+        def decorated_view(*args, **kwargs):
+            admission = current_app.extensions.get("admission")
+            if admission is None or not admission.enabled or request.method not in methods:
+                return func(*args, **kwargs)
+
+            endpoint = request.endpoint
+            retry_after = admission.check_limits(endpoint)
+            if retry_after:
+                admission.metrics.record(endpoint, "rate_limited")
+                _reject(429, "Too many requests, please try again later.", retry_after)
+            if not heavy:
+                admission.metrics.record(endpoint, "admitted")
+                return func(*args, **kwargs)
+
+            started = time.perf_counter()
+            if not admission.slots.acquire(timeout=admission.queue_timeout):
+                admission.metrics.record(endpoint, "overloaded")
+                _reject(503, "The server is busy, please try again shortly.", admission.queue_timeout)
+            admission.metrics.enter(endpoint, time.perf_counter() - started)
+            admission.metrics.record(endpoint, "admitted")
+            try:
+                return func(*args, **kwargs)
+            finally:
+                admission.metrics.leave()
+                admission.slots.release()
+        return decorated_view
+    return decorator
@@ -0,0 +1,54 @@
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.score import Score
+
+def attempts_used(user_id, quiz_id):
+    # Served by the (user_id, quiz_id, attempt_number) unique index
+    return db.session.execute(
+        db.select(db.func.max(Score.attempt_number))
+        .where(Score.user_id == user_id, Score.quiz_id == quiz_id)
+    ).scalar() or 0
+
+def attempts_left(user_id, quiz):
+    if not quiz.max_attempts:
+        return None
+    return max(quiz.max_attempts - attempts_used(user_id, quiz.id), 0)
+
+def latest_attempt(user_id, quiz_id):
+    return (
+        Score.query.filter_by(user_id=user_id, quiz_id=quiz_id)
+        .order_by(Score.attempt_number.desc())
+        .first()
+    )
+
+def find_submission(user_id, idempotency_key):
+    return Score.query.filter_by(user_id=user_id, idempotency_key=idempotency_key).first()
+
+def record_attempt(user_id, quiz, total_scored, idempotency_key, retries=3):
+    # Returns (score, created); score is None when no attempts are left.
+    # A replayed submission hits the unique (user_id, idempotency_key)
+    # constraint and gets the original row back; two different submissions
+    # racing for the same attempt number collide on (user_id, quiz_id,
+    # attempt_number) and the loser takes the next one, but never one past
+    # max_attempts, so the unique index is what enforces the limit.
+    for _ in range(retries):
+        attempt_number = attempts_used(user_id, quiz.id) + 1
+        if quiz.max_attempts and attempt_number > quiz.max_attempts:
+            return None, False
+        score = Score(
+            total_scored=total_scored,
+            quiz_id=quiz.id,
+            user_id=user_id,
+            attempt_number=attempt_number,
+            idempotency_key=idempotency_key
+        )
+        db.session.add(score)
+        try:
+            db.session.commit()
+            return score, True
+        except IntegrityError:
+            db.session.rollback()
+            existing = find_submission(user_id, idempotency_key)
+            if existing:
+                return existing, False
+    raise RuntimeError(f"Could not record attempt for user {user_id} on quiz {quiz.id}")
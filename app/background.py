@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+_executor = None
+_executor_lock = Lock()
+
+def _get_executor(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config.get("BACKGROUND_WORKERS", 2),
+                thread_name_prefix="quiz-master-background"
+            )
+        return _executor
+
+def _run(app, func, args, kwargs):
+    with app.app_context():
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            app.logger.exception("Background job %s failed", func.__name__)
+            raise
+
+def submit(app, func, *args, **kwargs):
+    # Jobs run in their own app context (and therefore their own database
+    # session) once the current request has finished with its data.
+    if app.config.get("BACKGROUND_JOBS_SYNC"):
+        return _run(app, func, args, kwargs)
+    return _get_executor(app).submit(_run, app, func, args, kwargs)
+
+def shutdown(wait=True):
+    # Jobs may queue more jobs while the pool drains (a bulk delete queues a
+    # progress refresh); those start a fresh pool, which is drained in turn.
+    global _executor
+    while True:
+        with _executor_lock:
+            executor, _executor = _executor, None
+        if executor is None:
+            return
+        executor.shutdown(wait=wait)
@@ -0,0 +1,198 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.background import submit
+from app.cache import cache
+from app.progress import mark_progress_stale, queue_stale_progress_refresh
+from app.models.bulk_job import BulkJob
+from app.models.chapter import Chapter
+from app.models.open_attempt import OpenAttempt
+from app.models.question import Question
+from app.models.quiz import Quiz
+from app.models.score import Score
+from app.models.subject import Subject
+from app.models.user import User
+from app.models.user_progress import UserProgress
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# Everything here works on ids with set-based SQL and commits after every
+# chunk, so no relationship is ever loaded into the session and no single
+# transaction holds its locks for the whole cascade.
+
+def _no_progress(table, deleted):
+    pass
+
+def _chunks(ids, chunk_size):
+    ids = list(ids)
+    for start in range(0, len(ids), chunk_size):
+        yield ids[start:start + chunk_size]
+
+def _delete_where(model, condition, chunk_size, progress):
+    deleted = 0
+    while True:
+        batch = db.select(model.id).where(condition).limit(chunk_size).scalar_subquery()
+        result = db.session.execute(
+            db.delete(model).where(model.id.in_(batch)).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if not result.rowcount:
+            return deleted
+        deleted += result.rowcount
+        progress(model.__tablename__, deleted)
+
+def _child_ids(column, parent_column, parent_ids, chunk_size):
+    # Yields one chunk of child ids at a time, re-querying after the caller
+    # has deleted the previous chunk, so a huge subtree never has to fit in
+    # memory and no cursor stays open across the deletes' commits. The
+    # caller must delete every yielded child, or this never finishes.
+    for parent_batch in _chunks(parent_ids, chunk_size):
+        while True:
+            batch = db.session.execute(
+                db.select(column).where(parent_column.in_(parent_batch)).limit(chunk_size)
+            ).scalars().all()
+            if not batch:
+                break
+            yield batch
+
+def delete_quizzes(quiz_ids, chunk_size=DEFAULT_CHUNK_SIZE, progress=_no_progress):
+    counts = {"score": 0, "question": 0, "quiz": 0}
+    for batch in _chunks(quiz_ids, chunk_size):
+        mark_progress_stale(batch)
+        _delete_where(OpenAttempt, OpenAttempt.quiz_id.in_(batch), chunk_size, progress)
+        counts["score"] += _delete_where(Score, Score.quiz_id.in_(batch), chunk_size, progress)
+        counts["question"] += _delete_where(Question, Question.quiz_id.in_(batch), chunk_size, progress)
+        counts["quiz"] += _delete_where(Quiz, Quiz.id.in_(batch), chunk_size, progress)
+    cache.invalidate("leaderboard")
+    queue_stale_progress_refresh()
+    return counts
+
+def delete_chapters(chapter_ids, chunk_size=DEFAULT_CHUNK_SIZE, progress=_no_progress):
+    chapter_ids = list(chapter_ids)
+    counts = {"score": 0, "question": 0, "quiz": 0, "chapter": 0}
+    for quiz_batch in _child_ids(Quiz.id, Quiz.chapter_id, chapter_ids, chunk_size):
+        for table, count in delete_quizzes(quiz_batch, chunk_size, progress).items():
+            counts[table] += count
+    for batch in _chunks(chapter_ids, chunk_size):
+        counts["chapter"] += _delete_where(Chapter, Chapter.id.in_(batch), chunk_size, progress)
+    return counts
+
+def delete_subjects(subject_ids, chunk_size=DEFAULT_CHUNK_SIZE, progress=_no_progress):
+    subject_ids = list(subject_ids)
+    counts = {"score": 0, "question": 0, "quiz": 0, "chapter": 0, "subject": 0}
+    for chapter_batch in _child_ids(Chapter.id, Chapter.subject_id, subject_ids, chunk_size):
+        for table, count in delete_chapters(chapter_batch, chunk_size, progress).items():
+            counts[table] += count
+    for batch in _chunks(subject_ids, chunk_size):
+        counts["subject"] += _delete_where(Subject, Subject.id.in_(batch), chunk_size, progress)
+    return counts
+
+def delete_users(user_ids, chunk_size=DEFAULT_CHUNK_SIZE, progress=_no_progress):
+    counts = {"score": 0, "user_progress": 0, "user": 0}
+    for batch in _chunks(user_ids, chunk_size):
+        # Admin accounts are never removed in bulk
+        regular = db.select(User.id).where(User.id.in_(batch), User.is_admin.isnot(True)).scalar_subquery()
+        _delete_where(OpenAttempt, OpenAttempt.user_id.in_(regular), chunk_size, progress)
+        counts["score"] += _delete_where(Score, Score.user_id.in_(regular), chunk_size, progress)
+        result = db.session.execute(
+            db.delete(UserProgress).where(UserProgress.user_id.in_(regular)).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        counts["user_progress"] += result.rowcount
+        counts["user"] += _delete_where(User, User.id.in_(regular), chunk_size, progress)
+    cache.invalidate("leaderboard")
+    return counts
+
+def _move(model, parent_column, ids, parent_id, chunk_size, affected_quizzes):
+    moved = 0
+    for batch in _chunks(ids, chunk_size):
+        # Progress vectors record each chapter's subject and each quiz's
+        # chapter, so everyone who scored on the moved items is recomputed.
+        mark_progress_stale(affected_quizzes(batch))
+        result = db.session.execute(
+            db.update(model).where(model.id.in_(batch)).values({parent_column: parent_id})
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        moved += result.rowcount
+    queue_stale_progress_refresh()
+    return moved
+
+def move_chapters(chapter_ids, subject_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    return _move(Chapter, Chapter.subject_id, chapter_ids, subject_id, chunk_size,
+                 lambda batch: db.select(Quiz.id).where(Quiz.chapter_id.in_(batch)))
+
+def move_quizzes(quiz_ids, chapter_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    return _move(Quiz, Quiz.chapter_id, quiz_ids, chapter_id, chunk_size, lambda batch: batch)
+
+DELETERS = {
+    "subjects": delete_subjects,
+    "chapters": delete_chapters,
+    "quizzes": delete_quizzes,
+    "users": delete_users,
+}
+
+MOVERS = {
+    "chapters": (move_chapters, Subject),
+    "quizzes": (move_quizzes, Chapter),
+}
+
+# Deletes started from the admin pages run as background jobs, so a large
+# cascade is never tied to a request (and a worker timeout); the job row
+# records the same progress lines the CLI prints.
+
+def run_bulk_job(job_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Claim the job atomically so a requeued job never runs twice at once
+    claimed = db.session.execute(
+        db.update(BulkJob)
+        .where(BulkJob.id == job_id, BulkJob.status == "queued")
+        .values(status="running", updated_at=datetime.now())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        return
+    job = db.session.get(BulkJob, job_id)
+
+    def progress(table, deleted):
+        job.progress = f"{table}: {deleted} rows deleted"
+        db.session.commit()
+
+    try:
+        counts = DELETERS[job.kind](job.ids(), chunk_size, progress)
+        job.result = ", ".join(f"{count} {table}" for table, count in counts.items())
+        job.status = "done"
+    except Exception as error:
+        db.session.rollback()
+        job.status = "failed"
+        job.error = str(error)
+    job.finished_at = datetime.now()
+    db.session.commit()
+
+def request_bulk_delete(kind, ids, requested_by):
+    job = BulkJob(kind=kind, target_ids=",".join(str(id) for id in ids), requested_by=requested_by)
+    db.session.add(job)
+    db.session.commit()
+    submit(current_app._get_current_object(), run_bulk_job, job.id)
+    return job
+
+def requeue_stale_bulk_jobs():
+    # Deletes are idempotent, so an interrupted job is simply run again
+    cutoff = datetime.now() - timedelta(seconds=current_app.config.get("BULK_STALE_AFTER", 600))
+    requeued = db.session.execute(
+        db.update(BulkJob)
+        .where(BulkJob.status == "running", BulkJob.updated_at < cutoff)
+        .values(status="queued")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return requeued
+
+def run_pending_bulk_jobs():
+    requeue_stale_bulk_jobs()
+    job_ids = db.session.execute(
+        db.select(BulkJob.id).where(BulkJob.status == "queued").order_by(BulkJob.id)
+    ).scalars().all()
+    for job_id in job_ids:
+        run_bulk_job(job_id)
+    return len(job_ids)
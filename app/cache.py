@@ -0,0 +1,284 @@
+import os
+import pickle
+import sqlite3
+import time
+from collections import Counter, OrderedDict
+from threading import Lock, local
+
+_MISSING = object()
+
+# The SQLite backend deletes expired rows (including entries orphaned by a
+# version bump) once every PRUNE_EVERY writes of a process.
+PRUNE_EVERY = 100
+
+class MemoryBackend:
+    # Per-process LRU; invalidations only reach the current worker.
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def _live(self, key, now):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= now:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def get(self, key):
+        with self.lock:
+            entry = self._live(key, time.time())
+            return _MISSING if entry is None else entry[0]
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (value, time.time() + ttl if ttl else None)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def add(self, key, value, ttl):
+        with self.lock:
+            if self._live(key, time.time()) is not None:
+                return False
+            self.entries[key] = (value, time.time() + ttl if ttl else None)
+            return True
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def incr(self, key):
+        with self.lock:
+            entry = self._live(key, time.time())
+            value = (entry[0] if entry else 0) + 1
+            self.entries[key] = (value, None)
+            return value
+
+class SQLiteBackend:
+    # Shared by every worker on the host that points at the same file.
+    def __init__(self, path, max_ttl=86400):
+        self.path = path
+        self.local = local()
+        # Entries never outlive max_ttl, so nothing but the namespace
+        # version counters stays in the file for good
+        self.max_ttl = max_ttl
+        self.writes = 0
+        self.writes_lock = Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        connection = self._connect()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS ix_cache_expires ON cache (expires)")
+
+    def _connect(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self.local.connection = connection
+        return connection
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)", (key, time.time())
+        ).fetchone()
+        return _MISSING if row is None else pickle.loads(row[0])
+
+    def _expires(self, ttl, now):
+        return now + min(ttl or self.max_ttl, self.max_ttl)
+
+    def _prune(self, connection, now):
+        with self.writes_lock:
+            self.writes += 1
+            due = self.writes % PRUNE_EVERY == 0
+        if due:
+            connection.execute("DELETE FROM cache WHERE expires <= ?", (now,))
+
+    def set(self, key, value, ttl):
+        connection = self._connect()
+        now = time.time()
+        connection.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value), self._expires(ttl, now))
+        )
+        self._prune(connection, now)
+
+    def add(self, key, value, ttl):
+        connection = self._connect()
+        now = time.time()
+        connection.execute("DELETE FROM cache WHERE key = ? AND expires <= ?", (key, now))
+        cursor = connection.execute(
+            "INSERT OR IGNORE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, pickle.dumps(value), self._expires(ttl, now))
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def incr(self, key):
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+            value = (pickle.loads(row[0]) if row else 0) + 1
+            connection.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, NULL)", (key, pickle.dumps(value))
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return value
+
+class RedisBackend:
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND 'redis' needs the redis package")
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self.client.get(key)
+        return _MISSING if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl):
+        self.client.set(key, pickle.dumps(value), ex=ttl or None)
+
+    def add(self, key, value, ttl):
+        return bool(self.client.set(key, pickle.dumps(value), ex=ttl or None, nx=True))
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def incr(self, key):
+        # Stored pickled like every other value so get() can read it back
+        with self.client.lock(f"{key}:incr", timeout=5):
+            value = self.get(key)
+            value = (0 if value is _MISSING else value) + 1
+            self.client.set(key, pickle.dumps(value))
+            return value
+
+class Cache:
+    def __init__(self):
+        self.backend = None
+        self.stats = Counter()
+        self.stats_lock = Lock()
+        self.versions = {}
+        # Striped so concurrent misses on one key share a lock without
+        # keeping a lock object around for every key ever seen
+        self.key_locks = [Lock() for _ in range(64)]
+
+    def init_app(self, app):
+        backend = app.config.get("CACHE_BACKEND", "sqlite")
+        if backend == "sqlite":
+            self.backend = SQLiteBackend(app.config["CACHE_URL"], app.config.get("CACHE_MAX_TTL", 86400))
+        elif backend == "redis":
+            self.backend = RedisBackend(app.config["CACHE_URL"])
+        elif backend == "memory":
+            self.backend = MemoryBackend(app.config.get("CACHE_MAX_ENTRIES", 10000))
+        else:
+            self.backend = None
+        self.prefix = app.config.get("CACHE_KEY_PREFIX", "quiz_master")
+        self.default_ttl = app.config.get("CACHE_DEFAULT_TTL", 300)
+        self.version_ttl = app.config.get("CACHE_VERSION_CHECK_INTERVAL", 1)
+        self.lock_ttl = app.config.get("CACHE_LOCK_TIMEOUT", 10)
+        app.extensions["cache"] = self
+
+    def _count(self, namespace, event):
+        with self.stats_lock:
+            self.stats[(namespace, event)] += 1
+
+    def _version(self, namespace):
+        # Namespace versions live in the shared backend; each worker re-reads
+        # them at most every CACHE_VERSION_CHECK_INTERVAL seconds.
+        now = time.time()
+        cached = self.versions.get(namespace)
+        if cached and cached[1] > now:
+            return cached[0]
+        version = self.backend.get(f"{self.prefix}:{namespace}:version")
+        version = 0 if version is _MISSING else version
+        self.versions[namespace] = (version, now + self.version_ttl)
+        return version
+
+    def _key(self, namespace, key):
+        return f"{self.prefix}:{namespace}:v{self._version(namespace)}:{key}"
+
+    def get(self, namespace, key, default=None):
+        if self.backend is None:
+            return default
+        value = self.backend.get(self._key(namespace, key))
+        self._count(namespace, "miss" if value is _MISSING else "hit")
+        return default if value is _MISSING else value
+
+    def set(self, namespace, key, value, ttl=None):
+        if self.backend is not None:
+            self.backend.set(self._key(namespace, key), value, self.default_ttl if ttl is None else ttl)
+
+    def delete(self, namespace, key):
+        if self.backend is not None:
+            self.backend.delete(self._key(namespace, key))
+
+    def invalidate(self, namespace):
+        # Bumping the version orphans every key of the namespace at once;
+        # the old entries age out through their TTL (or the LRU).
+        if self.backend is None:
+            return
+        version = self.backend.incr(f"{self.prefix}:{namespace}:version")
+        self.versions[namespace] = (version, time.time() + self.version_ttl)
+        self._count(namespace, "invalidation")
+
+    def _key_lock(self, full_key):
+        return self.key_locks[hash(full_key) % len(self.key_locks)]
+
+    def get_or_set(self, namespace, key, compute, ttl=None):
+        if self.backend is None:
+            return compute()
+        full_key = self._key(namespace, key)
+        value = self.backend.get(full_key)
+        if value is not _MISSING:
+            self._count(namespace, "hit")
+            return value
+        self._count(namespace, "miss")
+
+        # Single flight: one thread per process, and one process per backend
+        # (through an add()-based lock key), recomputes a missing value while
+        # the others wait for it.
+        with self._key_lock(full_key):
+            value = self.backend.get(full_key)
+            if value is not _MISSING:
+                return value
+            lock_key = f"{full_key}:lock"
+            deadline = time.time() + self.lock_ttl
+            while not self.backend.add(lock_key, True, self.lock_ttl):
+                self._count(namespace, "lock_wait")
+                time.sleep(0.05)
+                value = self.backend.get(full_key)
+                if value is not _MISSING:
+                    return value
+                if time.time() > deadline:
+                    break
+            try:
+                value = compute()
+                self.backend.set(full_key, value, self.default_ttl if ttl is None else ttl)
+            finally:
+                self.backend.delete(lock_key)
+            return value
+
+    def snapshot(self):
+        with self.stats_lock:
+            namespaces = {}
+            for (namespace, event), count in self.stats.items():
+                namespaces.setdefault(namespace, {})[event] = count
+        for counts in namespaces.values():
+            lookups = counts.get("hit", 0) + counts.get("miss", 0)
+            counts["hit_rate"] = counts.get("hit", 0) / lookups if lookups else None
+        return namespaces
+
+cache = Cache()
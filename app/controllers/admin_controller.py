@@ -1,14 +1,22 @@
+import os
 from functools import wraps
-from flask import Blueprint, render_template, redirect, flash, url_for
+from flask import Blueprint, render_template, redirect, flash, url_for, current_app, jsonify, request, abort, send_file
 from app import db
-from app.forms import SubjectForm, ChapterForm, QuizForm, QuestionForm
+from app.request_logging import audited, mark_audit_succeeded
+from app.bulk import DELETERS, MOVERS, request_bulk_delete
+from app.progress import mark_progress_stale, queue_stale_progress_refresh
+from app.templating import render_streamed
+from app.forms import SubjectForm, ChapterForm, QuizForm, QuestionForm, ReportForm
 from flask_login import current_user, login_required
+from app.models.bulk_job import BulkJob
 from app.models.chapter import Chapter
 from app.models.question import Question
 from app.models.quiz import Quiz
 from app.models.score import Score
 from app.models.subject import Subject
 from app.models.user import User
+from app.models.report_job import ReportJob
+from app.reports import available_formats, request_report
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -35,13 +43,17 @@ def admin_dashboard():
     average_scores = []
     completion_rates = []
 
-    for quiz in quizzes:
-        scores = Score.query.filter_by(quiz_id=quiz.id).all()
-        if scores:
-            average_score = sum([s.total_scored for s in scores]) / len(scores)
+    rows = db.session.execute(
+        db.select(Score.quiz_id, db.func.avg(Score.total_scored), db.func.count(db.distinct(Score.user_id)))
+        .group_by(Score.quiz_id)
+    )
+    quiz_stats = {quiz_id: (average, attempted) for quiz_id, average, attempted in rows}
+    user_count = User.query.count() - 1
 
-            users_attempted = len(scores)
-            completion_rate = (users_attempted / (User.query.count() - 1)) * 100
+    for quiz in quizzes:
+        if quiz.id in quiz_stats:
+            average_score, users_attempted = quiz_stats[quiz.id]
+            completion_rate = (users_attempted / user_count) * 100
         else:
            average_score = 0 
            completion_rate = 0
@@ -60,18 +72,21 @@ def manage_subjects():
 
 @admin_bp.route("/admin/add_subject", methods=['GET', 'POST'])
 @admin_login_required
+@audited("subject.add")
 def add_subject():
     form = SubjectForm()
     if form.validate_on_submit():
         subject = Subject(name=form.name.data, description=form.description.data)
         db.session.add(subject)
         db.session.commit()
+        mark_audit_succeeded()
         flash("Subject added successfully!", category="success")
         return redirect(url_for("admin.manage_subjects"))
     return render_template("admin/subject/add_subject.html", form=form)
 
 @admin_bp.route("/admin/edit_subject/<int:id>", methods=['GET', 'POST'])
 @admin_login_required
+@audited("subject.edit")
 def edit_subject(id):
     subject = Subject.query.get_or_404(id)
     form = SubjectForm(obj=subject)
@@ -79,27 +94,31 @@ def edit_subject(id):
         subject.name = form.name.data
         subject.description = form.description.data
         db.session.commit()
+        mark_audit_succeeded()
         flash("Subject updated successfully!", category="success")
         return redirect(url_for("admin.manage_subjects"))
     return render_template("admin/subject/edit_subject.html", form=form)
 
 @admin_bp.route("/admin/delete_subject/<int:id>", methods=['POST'])
 @admin_login_required
+@audited("subject.delete")
 def delete_subject(id):
-    subject = Subject.query.get_or_404(id)
-    db.session.delete(subject)
-    db.session.commit()
-    flash("Subject deleted successfully!", category="success")
-    return redirect(url_for("admin.manage_subjects"))
+    Subject.query.get_or_404(id)
+    request_bulk_delete("subjects", [id], current_user.id)
+    mark_audit_succeeded()
+    flash("Subject deletion started, it will be gone shortly.", category="success")
+    return redirect(url_for("admin.bulk_jobs"))
 
 @admin_bp.route("/admin/manage_chapters")
 @admin_login_required
 def manage_chapters():
     chapters = Chapter.query.all()
-    return render_template("admin/chapter/manage_chapters.html", chapters=chapters)
+    subjects = Subject.query.all()
+    return render_template("admin/chapter/manage_chapters.html", chapters=chapters, subjects=subjects)
 
 @admin_bp.route("/admin/add_chapter", methods=['GET', 'POST'])
 @admin_login_required
+@audited("chapter.add")
 def add_chapter():
     form = ChapterForm()
     form.subject_id.choices = [(s.id, s.name) for s in Subject.query.all()]
@@ -111,12 +130,14 @@ def add_chapter():
         )
         db.session.add(chapter)
         db.session.commit()
+        mark_audit_succeeded()
         flash("Chapter added successfully!", category="success")
         return redirect(url_for("admin.manage_chapters"))
     return render_template("admin/chapter/add_chapter.html", form=form)
 
 @admin_bp.route("/admin/edit_chapter/<int:id>", methods=['GET', 'POST'])
 @admin_login_required
+@audited("chapter.edit")
 def edit_chapter(id):
     chapter = Chapter.query.get_or_404(id)
     form = ChapterForm(obj=chapter)
@@ -126,27 +147,31 @@ def edit_chapter(id):
         chapter.description = form.description.data
         chapter.subject_id = form.subject_id.data
         db.session.commit()
+        mark_audit_succeeded()
         flash("Chapter updated successfully!", category="success")
         return redirect(url_for("admin.manage_chapters"))
     return render_template("admin/chapter/edit_chapter.html", form=form)
 
 @admin_bp.route("/admin/delete_chapter/<int:id>", methods=['POST'])
 @admin_login_required
+@audited("chapter.delete")
 def delete_chapter(id):
-    chapter = Chapter.query.get_or_404(id)
-    db.session.delete(chapter)
-    db.session.commit()
-    flash("Chapter deleted successfully!", category="success")
-    return redirect(url_for("admin.manage_chapters"))
+    Chapter.query.get_or_404(id)
+    request_bulk_delete("chapters", [id], current_user.id)
+    mark_audit_succeeded()
+    flash("Chapter deletion started, it will be gone shortly.", category="success")
+    return redirect(url_for("admin.bulk_jobs"))
 
 @admin_bp.route("/admin/manage_quizzes")
 @admin_login_required
 def manage_quizzes():
     quizzes = Quiz.query.all()
-    return render_template("admin/quiz/manage_quizzes.html", quizzes=quizzes)
+    chapters = Chapter.query.all()
+    return render_template("admin/quiz/manage_quizzes.html", quizzes=quizzes, chapters=chapters)
 
 @admin_bp.route("/admin/add_quiz", methods=['GET', 'POST'])
 @admin_login_required
+@audited("quiz.add")
 def add_quiz():
     form = QuizForm()
     form.chapter_id.choices = [(c.id, c.name) for c in Chapter.query.all()]
@@ -155,44 +180,156 @@ def add_quiz():
             name=form.name.data,
             date_of_quiz=form.date_of_quiz.data,
             time_duration=form.time_duration.data,
+            pool_size=form.pool_size.data or 0,
+            max_attempts=form.max_attempts.data or 0,
             chapter_id=form.chapter_id.data
         )
         db.session.add(quiz)
         db.session.commit()
+        mark_audit_succeeded()
         flash("Quiz added successfully!", category="success")
         return redirect(url_for("admin.manage_quizzes"))
     return render_template("admin/quiz/add_quiz.html", form=form)
 
 @admin_bp.route("/admin/edit_quiz/<int:id>", methods=['GET', 'POST'])
 @admin_login_required
+@audited("quiz.edit")
 def edit_quiz(id):
     quiz = Quiz.query.get_or_404(id)
     form = QuizForm(obj=quiz)
     form.chapter_id.choices = [(c.id, c.name) for c in Chapter.query.all()]
     if form.validate_on_submit():
+        # Progress vectors and recommendations depend on these
+        progress_fields = (quiz.chapter_id, quiz.pool_size, quiz.max_attempts)
         quiz.name = form.name.data
         quiz.date_of_quiz = form.date_of_quiz.data
         quiz.time_duration = form.time_duration.data
+        quiz.pool_size = form.pool_size.data or 0
+        quiz.max_attempts = form.max_attempts.data or 0
         quiz.chapter_id = form.chapter_id.data
+        progress_changed = (quiz.chapter_id, quiz.pool_size, quiz.max_attempts) != progress_fields
         db.session.commit()
+        if progress_changed:
+            mark_progress_stale([id])
+            queue_stale_progress_refresh()
+        mark_audit_succeeded()
         flash("Quiz updated successfully!", category="success")
         return redirect(url_for("admin.manage_quizzes"))
     return render_template("admin/quiz/edit_quiz.html", form=form)
 
 @admin_bp.route("/admin/delete_quiz/<int:id>", methods=['POST'])
 @admin_login_required
+@audited("quiz.delete")
 def delete_quiz(id):
-    quiz = Quiz.query.get_or_404(id)
-    db.session.delete(quiz)
-    db.session.commit()
-    flash("Quiz deleted successfully!", category="success")
-    return redirect(url_for("admin.manage_quizzes"))
+    Quiz.query.get_or_404(id)
+    request_bulk_delete("quizzes", [id], current_user.id)
+    mark_audit_succeeded()
+    flash("Quiz deletion started, it will be gone shortly.", category="success")
+    return redirect(url_for("admin.bulk_jobs"))
 
 @admin_bp.route("/admin/manage_users")
 @admin_login_required
 def manage_users():
-    users = User.query.all()
-    return render_template("admin/manage_users.html", users=users)
+    users = User.query.order_by(User.id).yield_per(500)
+    return render_streamed("admin/manage_users.html", users=users)
+
+@admin_bp.route("/admin/bulk_delete/<kind>", methods=['POST'])
+@admin_login_required
+@audited("bulk.delete")
+def bulk_delete(kind):
+    if kind not in DELETERS:
+        abort(404)
+    ids = request.form.getlist("ids", type=int)
+    if not ids:
+        flash("Nothing selected!", category="error")
+        return redirect(url_for(f"admin.manage_{kind}"))
+    request_bulk_delete(kind, ids, current_user.id)
+    mark_audit_succeeded()
+    flash(f"Deleting {len(ids)} {kind}, they will be gone shortly.", category="success")
+    return redirect(url_for("admin.bulk_jobs"))
+
+@admin_bp.route("/admin/bulk_jobs")
+@admin_login_required
+def bulk_jobs():
+    jobs = BulkJob.query.order_by(BulkJob.id.desc()).limit(50).all()
+    return render_template("admin/bulk_jobs.html", jobs=jobs)
+
+@admin_bp.route("/admin/bulk_jobs/<int:id>")
+@admin_login_required
+def bulk_job_status(id):
+    return jsonify(BulkJob.query.get_or_404(id).to_dict())
+
+@admin_bp.route("/admin/bulk_move/<kind>", methods=['POST'])
+@admin_login_required
+@audited("bulk.move")
+def bulk_move(kind):
+    if kind not in MOVERS:
+        abort(404)
+    mover, parent_model = MOVERS[kind]
+    ids = request.form.getlist("ids", type=int)
+    target = db.session.get(parent_model, request.form.get("target_id", type=int) or 0)
+    if not ids or target is None:
+        flash("Select the items to move and where to move them!", category="error")
+        return redirect(url_for(f"admin.manage_{kind}"))
+    moved = mover(ids, target.id)
+    mark_audit_succeeded()
+    flash(f"Moved {moved} {kind} to {target.name}!", category="success")
+    return redirect(url_for(f"admin.manage_{kind}"))
+
+@admin_bp.route("/admin/reports", methods=['GET', 'POST'])
+@admin_login_required
+@audited("report.request")
+def reports():
+    form = ReportForm()
+    form.format.choices = available_formats()
+    form.quiz_id.choices = [(0, "All quizzes")] + [(q.id, q.name) for q in Quiz.query.all()]
+    if form.validate_on_submit():
+        if form.kind.data == "quiz_results" and not form.quiz_id.data:
+            flash("Choose a quiz for the result sheet!", category="error")
+        else:
+            request_report(
+                form.kind.data,
+                form.format.data,
+                current_user.id,
+                quiz_id=form.quiz_id.data or None,
+                user_id=form.user_id.data
+            )
+            mark_audit_succeeded()
+            flash("Export requested, it will be ready for download shortly.", category="success")
+            return redirect(url_for("admin.reports"))
+    jobs = ReportJob.query.order_by(ReportJob.id.desc()).limit(50).all()
+    return render_template("admin/reports.html", form=form, jobs=jobs)
+
+@admin_bp.route("/admin/reports/<int:id>")
+@admin_login_required
+def report_status(id):
+    return jsonify(ReportJob.query.get_or_404(id).to_dict())
+
+@admin_bp.route("/admin/reports/<int:id>/download")
+@admin_login_required
+def download_report(id):
+    job = ReportJob.query.get_or_404(id)
+    if job.status != "done" or not job.file_path:
+        abort(404)
+    return send_file(os.path.abspath(job.file_path), as_attachment=True)
+
+@admin_bp.route("/admin/cache_stats")
+@admin_login_required
+def cache_stats():
+    cache = current_app.extensions.get("cache")
+    return jsonify(cache.snapshot() if cache else {})
+
+@admin_bp.route("/admin/template_stats")
+@admin_login_required
+def template_stats():
+    stats = current_app.extensions.get("template_stats")
+    return jsonify(stats.snapshot() if stats else {})
+
+@admin_bp.route("/admin/admission_stats")
+@admin_login_required
+def admission_stats():
+    admission = current_app.extensions.get("admission")
+    return jsonify(admission.metrics.snapshot() if admission else {})
 
 @admin_bp.route("/admin/manage_quiz_questions/<int:quiz_id>")
 @admin_login_required
@@ -203,6 +340,7 @@ def manage_quiz_questions(quiz_id):
 
 @admin_bp.route("/admin/add_question/<int:quiz_id>", methods=['GET', 'POST'])
 @admin_login_required
+@audited("question.add")
 def add_question(quiz_id):
     form = QuestionForm()
     if form.validate_on_submit():
@@ -217,6 +355,7 @@ def add_question(quiz_id):
         )
         db.session.add(question)
         db.session.commit()
+        mark_audit_succeeded()
         flash("Question added successfully!", category="success")
         return redirect(url_for("admin.manage_quiz_questions", quiz_id=quiz_id))
     return render_template("admin/question/add_question.html", form=form, quiz_id=quiz_id)
\ No newline at end of file
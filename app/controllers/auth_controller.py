@@ -1,6 +1,8 @@
 from flask import Blueprint, render_template, redirect, flash, url_for
 from app import db
 from app.forms import RegisterForm, LoginForm
+from app.admission import admission_controlled
+from app.cache import cache
 from flask_login import login_user, login_required, logout_user
 import os
 from app.models.user import User
@@ -8,6 +10,7 @@ from app.models.user import User
 auth_bp = Blueprint('auth', __name__)
 
 @auth_bp.route("/register", methods=['GET', 'POST'])
+@admission_controlled()
 def register():
     form = RegisterForm()
     if form.validate_on_submit():
@@ -20,11 +23,13 @@ def register():
         user.set_password(form.password.data)
         db.session.add(user)
         db.session.commit()
+        cache.invalidate("leaderboard")
         flash('Registration is successful!', category="success")
         return redirect(url_for('auth.login'))
     return render_template("register.html", form=form)
 
 @auth_bp.route("/login", methods=['GET', 'POST'])
+@admission_controlled()
 def login():
     form = LoginForm()
     if form.validate_on_submit():
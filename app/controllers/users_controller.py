@@ -1,75 +1,135 @@
 from flask import Blueprint, render_template, redirect, flash, url_for, request
 from app import db
+from app.templating import render_streamed
+from app.admission import admission_controlled
+from app.cache import cache
+from app.attempts import attempts_left, find_submission, latest_attempt, record_attempt
+from app.progress import queue_progress_refresh
+from app.question_pool import build_attempt, load_attempt_questions, grade, questions_per_attempt
 from flask_login import current_user, login_required
-from random import shuffle
+from uuid import uuid4
 from app.models.chapter import Chapter
+from app.models.open_attempt import OpenAttempt
 from app.models.quiz import Quiz
 from app.models.score import Score
 from app.models.subject import Subject
 from app.models.user import User
+from app.models.user_progress import UserProgress
 
 users_bp = Blueprint('users', __name__)
 
+MAX_OPEN_ATTEMPTS = 5
+
 @users_bp.route("/dashboard")
 @login_required
 def dashboard():
-    scores = Score.query.filter_by(user_id=current_user.id).all()
+    scores = Score.query.filter_by(user_id=current_user.id).options(db.joinedload(Score.quiz)).all()
     total_attempted_quizzes = len(scores)
 
     average_score = sum([s.total_scored for s in scores]) / total_attempted_quizzes if total_attempted_quizzes > 0 else 0
 
+    progress = db.session.get(UserProgress, current_user.id)
+    chapter_progress = []
+    subject_progress = []
+    recommended_quizzes = []
+    if progress:
+        chapter_mastery = progress.chapter_mastery()
+        subject_mastery = progress.subject_mastery()
+        recommended_ids = progress.recommended_quiz_ids()
+        chapters = Chapter.query.filter(Chapter.id.in_(chapter_mastery)).all()
+        subjects = Subject.query.filter(Subject.id.in_(subject_mastery)).all()
+        quizzes = {quiz.id: quiz for quiz in Quiz.query.filter(Quiz.id.in_(recommended_ids))}
+        chapter_progress = [(chapter.name, chapter_mastery[chapter.id] * 100) for chapter in chapters]
+        subject_progress = [(subject.name, subject_mastery[subject.id] * 100) for subject in subjects]
+        recommended_quizzes = [quizzes[quiz_id] for quiz_id in recommended_ids if quiz_id in quizzes]
+
     return render_template("user/dashboard.html",
                            scores=scores,
                            total_attempted_quizzes=total_attempted_quizzes,
-                           average_score=average_score)
+                           average_score=average_score,
+                           chapter_progress=chapter_progress,
+                           subject_progress=subject_progress,
+                           recommended_quizzes=recommended_quizzes)
 
 @users_bp.route("/attempt_quiz/<int:quiz_id>", methods=['GET', 'POST'])
 @login_required
+@admission_controlled()
 def attempt_quiz(quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
-    questions = quiz.questions.copy()
-    shuffle(questions)
     if request.method == 'POST':
-        score = 0
-        for question in questions:
-            user_answer = request.form.get(f'question_{question.id}')
-            if user_answer and int(user_answer) == question.correct_option:
-                score += 1
-        user_score = Score(
-            total_scored=score,
-            quiz_id=quiz_id,
-            user_id=current_user.id
-        )
-        db.session.add(user_score)
+        # Open attempts are keyed by their idempotency key so several tabs
+        # each grade against the questions they actually showed.
+        idempotency_key = request.form.get('idempotency_key', '')
+        if idempotency_key and find_submission(current_user.id, idempotency_key):
+            # Double click or automatic retry of a submission already recorded
+            return redirect(url_for("users.quiz_results", quiz_id=quiz_id))
+        open_attempt = OpenAttempt.query.filter_by(
+            idempotency_key=idempotency_key, user_id=current_user.id, quiz_id=quiz_id
+        ).first()
+        if open_attempt is None:
+            flash("Your quiz session has expired, please start the quiz again.", category="error")
+            return redirect(url_for("users.attempt_quiz", quiz_id=quiz_id))
+        attempt = load_attempt_questions(open_attempt.question_layout())
+        score = grade(attempt, request.form)
+        user_score, created = record_attempt(current_user.id, quiz, score, idempotency_key)
+        db.session.delete(open_attempt)
         db.session.commit()
-        flash(f'Quiz completed! Your score: {score} / {len(questions)}', category="success")
+        if user_score is None:
+            flash("You have used all your attempts for this quiz.", category="error")
+        elif created:
+            cache.invalidate("leaderboard")
+            queue_progress_refresh(current_user.id)
+            flash(f'Quiz completed! Your score: {score} / {len(attempt)}', category="success")
+        return redirect(url_for("users.quiz_results", quiz_id=quiz_id))
+    if attempts_left(current_user.id, quiz) == 0:
+        flash("You have used all your attempts for this quiz.", category="error")
         return redirect(url_for("users.quiz_results", quiz_id=quiz_id))
-    return render_template("user/attempt_quiz.html", quiz=quiz, questions=questions)
+    layout = build_attempt(quiz_id, quiz.pool_size or 0)
+    idempotency_key = uuid4().hex
+    # Only the most recently opened attempts of each user are kept
+    kept = (
+        db.select(OpenAttempt.id).where(OpenAttempt.user_id == current_user.id)
+        .order_by(OpenAttempt.id.desc()).limit(MAX_OPEN_ATTEMPTS - 1)
+    )
+    db.session.execute(
+        db.delete(OpenAttempt)
+        .where(OpenAttempt.user_id == current_user.id, OpenAttempt.id.not_in(kept.scalar_subquery()))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.add(OpenAttempt(idempotency_key=idempotency_key, user_id=current_user.id,
+                               quiz_id=quiz_id, layout=layout.tobytes()))
+    db.session.commit()
+    attempt = load_attempt_questions(layout)
+    return render_template("user/attempt_quiz.html", quiz=quiz, attempt=attempt, idempotency_key=idempotency_key)
 
 @users_bp.route("/quiz_results/<int:quiz_id>")
 @login_required
 def quiz_results(quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
-    score = Score.query.filter_by(user_id=current_user.id, quiz_id=quiz_id).first()
-    return render_template("user/quiz_results.html", quiz=quiz, score=score)
+    score = latest_attempt(current_user.id, quiz_id)
+    return render_template("user/quiz_results.html",
+                           quiz=quiz,
+                           score=score,
+                           question_count=questions_per_attempt(quiz))
+
+def leaderboard_totals():
+    total_score = db.func.coalesce(db.func.sum(Score.total_scored), 0)
+    rows = db.session.execute(
+        db.select(User.fullname, total_score)
+        .outerjoin(Score, Score.user_id == User.id)
+        .where(User.username != "admin@quiz.com")
+        .group_by(User.id, User.fullname)
+        .order_by(total_score.desc())
+    ).all()
+    return [{"user_fullname": fullname, "total_score": total} for fullname, total in rows]
 
 @users_bp.route("/leaderboard")
 @login_required
 def leaderboard():
-    users = User.get_all_users()
-    leaderboard_data = []
-
-    for user in users:
-        scores = Score.query.filter_by(user_id=user.id).all()
-        total_score = sum([s.total_scored for s in scores])
-        leaderboard_data.append({
-            "user_fullname": user.fullname,
-            "total_score": total_score
-        })
-    leaderboard_data.sort(key=lambda x: x['total_score'], reverse=True)
+    leaderboard_data = cache.get_or_set("leaderboard", "totals", leaderboard_totals)
     user_fullnames = [x['user_fullname'] for x in leaderboard_data]
     user_total_scores = [x['total_score'] for x in leaderboard_data]
-    return render_template("user/leaderboard.html",
+    return render_streamed("user/leaderboard.html",
                            leaderboard_data=leaderboard_data,
                            user_fullnames=user_fullnames,
                            user_total_scores=user_total_scores)
@@ -90,7 +150,13 @@ def select_quiz():
         if chapter_id:
             quizzes = Quiz.query.filter_by(chapter_id=chapter_id).all()
 
+    progress = db.session.get(UserProgress, current_user.id)
+    recommended_ids = progress.recommended_quiz_ids() if progress else []
+    recommended_quizzes = Quiz.query.filter(Quiz.id.in_(recommended_ids)).all() if recommended_ids else []
+    recommended_quizzes.sort(key=lambda quiz: recommended_ids.index(quiz.id))
+
     return render_template("user/select-quiz.html",
                            subjects=subjects,
                            chapters=chapters,
-                           quizzes=quizzes)
\ No newline at end of file
+                           quizzes=quizzes,
+                           recommended_quizzes=recommended_quizzes)
\ No newline at end of file
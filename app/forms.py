@@ -1,6 +1,6 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, DateField, SubmitField, TextAreaField, SelectField, IntegerField, DateTimeLocalField
-from wtforms.validators import Email, Length, EqualTo, DataRequired
+from wtforms.validators import Email, Length, EqualTo, DataRequired, Optional, NumberRange
 
 class RegisterForm(FlaskForm):
     username = StringField('Email', validators=[DataRequired(), Email()])
@@ -31,6 +31,8 @@ class QuizForm(FlaskForm):
     name = StringField('Name', validators=[DataRequired()])
     date_of_quiz = DateTimeLocalField('Date of Quiz', validators=[DataRequired()])
     time_duration = IntegerField('Time Duration (In seconds)')
+    pool_size = IntegerField('Questions per Attempt (0 for all)', validators=[Optional(), NumberRange(min=0)])
+    max_attempts = IntegerField('Attempts Allowed (0 for unlimited)', validators=[Optional(), NumberRange(min=0)])
     chapter_id = SelectField('Chapter', coerce=int, validators=[DataRequired()])
     submit = SubmitField('Submit')
 
@@ -41,4 +43,11 @@ class QuestionForm(FlaskForm):
     option3 = StringField('Option 3', validators=[DataRequired()])
     option4 = StringField('Option 4', validators=[DataRequired()])
     correct_option = IntegerField('Correct Option (1-4)', validators=[DataRequired()])
-    submit = SubmitField('Save')
\ No newline at end of file
+    submit = SubmitField('Save')
+
+class ReportForm(FlaskForm):
+    kind = SelectField('Report', choices=[('scores', 'All scores'), ('users', 'Users'), ('quiz_results', 'Quiz result sheet')])
+    format = SelectField('Format')
+    quiz_id = SelectField('Quiz (required for result sheets)', coerce=int)
+    user_id = IntegerField('User Id', validators=[Optional()])
+    submit = SubmitField('Request Export')
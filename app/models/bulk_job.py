@@ -0,0 +1,32 @@
+from datetime import datetime
+from app import db
+
+class BulkJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    # Comma separated ids of the subjects, chapters, quizzes or users to delete
+    target_ids = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    # Latest progress line, e.g. "score: 3000 rows deleted"
+    progress = db.Column(db.String(255))
+    result = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    requested_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    finished_at = db.Column(db.DateTime)
+    # Touched with every progress commit; a running job that stops updating
+    # belonged to a worker that died
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def ids(self):
+        return [int(id) for id in self.target_ids.split(",") if id]
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+        }
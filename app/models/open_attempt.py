@@ -0,0 +1,18 @@
+from array import array
+from app import db
+
+class OpenAttempt(db.Model):
+    # The exact layout an attempt page showed, kept until it is submitted so
+    # grading never re-samples or reshuffles the live question table.
+    id = db.Column(db.Integer, primary_key=True)
+    idempotency_key = db.Column(db.String(64), nullable=False, unique=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
+    # Packed uint32 pairs of (question_id, index into OPTION_ORDERS)
+    layout = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+
+    def question_layout(self):
+        values = array('I')
+        values.frombytes(self.layout)
+        return values
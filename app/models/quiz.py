@@ -5,6 +5,11 @@ class Quiz(db.Model):
     name = db.Column(db.String(100), nullable=False)
     date_of_quiz = db.Column(db.DateTime)
     time_duration = db.Column(db.Integer, default=0)
+    # Questions drawn per attempt; empty or 0 uses every question. Older
+    # databases get the column from `flask db upgrade`.
+    pool_size = db.Column(db.Integer, default=0)
+    # Attempts allowed per user; empty or 0 means unlimited
+    max_attempts = db.Column(db.Integer, default=0)
     chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False)
 
     questions = db.relationship('Question', backref='quiz', lazy=True)
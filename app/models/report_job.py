@@ -0,0 +1,31 @@
+from datetime import datetime
+from app import db
+
+class ReportJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    format = db.Column(db.String(10), nullable=False, default='csv')
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id', ondelete='SET NULL'))
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'))
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    total_rows = db.Column(db.Integer)
+    rows_written = db.Column(db.Integer, nullable=False, default=0)
+    file_path = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    requested_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    finished_at = db.Column(db.DateTime)
+    # Touched with every progress commit; a running job that stops updating
+    # belonged to a worker that died
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "format": self.format,
+            "status": self.status,
+            "rows_written": self.rows_written,
+            "total_rows": self.total_rows,
+            "error": self.error,
+        }
@@ -5,4 +5,11 @@ class Score(db.Model):
     total_scored = db.Column(db.Integer, nullable=False)
     timestamp = db.Column(db.DateTime, default=db.func.current_timestamp())
     quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
\ No newline at end of file
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    attempt_number = db.Column(db.Integer, nullable=False, default=1)
+    idempotency_key = db.Column(db.String(64))
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'quiz_id', 'attempt_number', name='uq_score_user_quiz_attempt'),
+        db.UniqueConstraint('user_id', 'idempotency_key', name='uq_score_user_idempotency_key'),
+    )
@@ -0,0 +1,48 @@
+from array import array
+from app import db
+
+class UserProgress(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    # Packed uint32 groups of (chapter_id, subject_id, scored, possible)
+    chapters = db.Column(db.LargeBinary, nullable=False, default=b'')
+    # Packed uint32 quiz ids, best recommendation first
+    recommended = db.Column(db.LargeBinary, nullable=False, default=b'')
+    # Set when quizzes or chapters the user scored on are deleted or moved;
+    # cleared by the next refresh
+    stale = db.Column(db.Boolean, nullable=False, default=False, index=True)
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+
+    def chapter_entries(self):
+        values = array('I')
+        values.frombytes(self.chapters or b'')
+        return {values[i]: tuple(values[i + 1:i + 4]) for i in range(0, len(values), 4)}
+
+    def set_chapter_entries(self, entries):
+        values = array('I')
+        for chapter_id, (subject_id, scored, possible) in sorted(entries.items()):
+            values.extend((chapter_id, subject_id, scored, possible))
+        self.chapters = values.tobytes()
+
+    def chapter_mastery(self):
+        return {
+            chapter_id: scored / possible if possible else 0
+            for chapter_id, (_, scored, possible) in self.chapter_entries().items()
+        }
+
+    def subject_mastery(self):
+        totals = {}
+        for subject_id, scored, possible in self.chapter_entries().values():
+            subject_scored, subject_possible = totals.get(subject_id, (0, 0))
+            totals[subject_id] = (subject_scored + scored, subject_possible + possible)
+        return {
+            subject_id: scored / possible if possible else 0
+            for subject_id, (scored, possible) in totals.items()
+        }
+
+    def recommended_quiz_ids(self):
+        values = array('I')
+        values.frombytes(self.recommended or b'')
+        return list(values)
+
+    def set_recommended_quiz_ids(self, quiz_ids):
+        self.recommended = array('I', quiz_ids).tobytes()
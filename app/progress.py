@@ -0,0 +1,111 @@
+from flask import current_app
+from sqlalchemy.orm.exc import StaleDataError
+from app import db
+from app.background import submit
+from app.models.chapter import Chapter
+from app.models.question import Question
+from app.models.quiz import Quiz
+from app.models.score import Score
+from app.models.user_progress import UserProgress
+
+RECOMMENDATION_COUNT = 5
+
+def _quiz_stats(user_id):
+    # One row per quiz: its chapter/subject, the points an attempt can earn,
+    # the user's best score so far (NULL when never attempted), the attempts
+    # they have used and the quiz's attempt limit (0 for unlimited).
+    question_counts = (
+        db.select(Question.quiz_id, db.func.count(Question.id).label("questions"))
+        .group_by(Question.quiz_id)
+        .subquery()
+    )
+    best_scores = (
+        db.select(Score.quiz_id, db.func.max(Score.total_scored).label("best"),
+                  db.func.max(Score.attempt_number).label("attempts"))
+        .where(Score.user_id == user_id)
+        .group_by(Score.quiz_id)
+        .subquery()
+    )
+    questions = db.func.coalesce(question_counts.c.questions, 0)
+    possible = db.case(
+        (db.and_(Quiz.pool_size > 0, Quiz.pool_size < questions), Quiz.pool_size),
+        else_=questions
+    )
+    return (
+        db.select(Quiz.id, Quiz.chapter_id, Chapter.subject_id, possible.label("possible"), best_scores.c.best,
+                  best_scores.c.attempts, Quiz.max_attempts)
+        .join(Chapter, Quiz.chapter_id == Chapter.id)
+        .outerjoin(question_counts, question_counts.c.quiz_id == Quiz.id)
+        .outerjoin(best_scores, best_scores.c.quiz_id == Quiz.id)
+    )
+
+def _chapter_entries(rows):
+    entries = {}
+    for _, chapter_id, subject_id, possible, best, _, _ in rows:
+        _, scored, total = entries.get(chapter_id, (subject_id, 0, 0))
+        entries[chapter_id] = (subject_id, scored + min(best or 0, possible), total + possible)
+    return entries
+
+def _recommend(rows, mastery):
+    candidates = []
+    for quiz_id, chapter_id, _, possible, best, attempts, max_attempts in rows:
+        if not possible or (best is not None and best >= possible):
+            continue
+        if max_attempts and (attempts or 0) >= max_attempts:
+            continue
+        # Weakest started chapters first, then untouched chapters; within a
+        # chapter, quizzes not tried yet come before ones to retry.
+        started = chapter_id in mastery
+        candidates.append((not started, mastery.get(chapter_id, 0), best is not None, quiz_id))
+    candidates.sort()
+    return [candidate[-1] for candidate in candidates[:RECOMMENDATION_COUNT]]
+
+def refresh_user_progress(user_id):
+    # A single aggregate query per user; runs after each attempt so only the
+    # user who just submitted is recomputed.
+    progress = db.session.get(UserProgress, user_id) or UserProgress(user_id=user_id)
+    rows = db.session.execute(_quiz_stats(user_id)).all()
+    attempted_chapters = {row.chapter_id for row in rows if row.best is not None}
+    progress.set_chapter_entries(_chapter_entries(row for row in rows if row.chapter_id in attempted_chapters))
+    progress.set_recommended_quiz_ids(_recommend(rows, progress.chapter_mastery()))
+    progress.stale = False
+    db.session.add(progress)
+    db.session.commit()
+    return progress
+
+def queue_progress_refresh(user_id):
+    submit(current_app._get_current_object(), refresh_user_progress, user_id)
+
+def mark_progress_stale(quiz_ids):
+    # Set-based: flags everyone who scored on the given quizzes without
+    # loading their rows, so it can run before those scores are deleted.
+    affected_users = db.select(Score.user_id).where(Score.quiz_id.in_(quiz_ids)).distinct()
+    db.session.execute(
+        db.update(UserProgress).where(UserProgress.user_id.in_(affected_users)).values(stale=True)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+def refresh_stale_progress(chunk_size=500):
+    refreshed = 0
+    while True:
+        user_ids = db.session.execute(
+            db.select(UserProgress.user_id).where(UserProgress.stale.is_(True)).limit(chunk_size)
+        ).scalars().all()
+        if not user_ids:
+            return refreshed
+        for user_id in user_ids:
+            try:
+                refresh_user_progress(user_id)
+            except StaleDataError:
+                # The user was deleted (by a background bulk delete) mid-refresh
+                db.session.rollback()
+                continue
+            refreshed += 1
+
+def queue_stale_progress_refresh():
+    submit(current_app._get_current_object(), refresh_stale_progress)
+
+def rebuild_all_progress(user_ids):
+    for user_id in user_ids:
+        refresh_user_progress(user_id)
@@ -0,0 +1,68 @@
+import random
+from array import array
+from itertools import permutations
+from app import db
+from app.models.question import Question
+
+# All 24 orderings of the four options; an attempt stores the index into this
+# table instead of the ordering itself.
+OPTION_ORDERS = list(permutations((1, 2, 3, 4)))
+
+def sample_question_ids(quiz_id, pool_size, rng):
+    query = db.select(Question.id).where(Question.quiz_id == quiz_id).order_by(Question.id)
+    total = db.session.execute(
+        db.select(db.func.count()).select_from(query.subquery())
+    ).scalar_one()
+    if not pool_size or pool_size >= total:
+        picked = set(range(total))
+    else:
+        # sample() over a range only keeps the K chosen offsets in memory,
+        # and the id scan below streams instead of loading the whole pool.
+        picked = set(rng.sample(range(total), pool_size))
+    ids = []
+    rows = db.session.execute(query.execution_options(yield_per=1000)).scalars()
+    for index, question_id in enumerate(rows):
+        if index in picked:
+            ids.append(question_id)
+            if len(ids) == len(picked):
+                break
+    rows.close()
+    rng.shuffle(ids)
+    return ids
+
+def build_attempt(quiz_id, pool_size):
+    rng = random.Random()
+    layout = array('I')
+    for question_id in sample_question_ids(quiz_id, pool_size, rng):
+        layout.append(question_id)
+        layout.append(rng.randrange(len(OPTION_ORDERS)))
+    return layout
+
+def questions_per_attempt(quiz):
+    total = db.session.execute(
+        db.select(db.func.count(Question.id)).where(Question.quiz_id == quiz.id)
+    ).scalar_one()
+    return min(quiz.pool_size, total) if quiz.pool_size else total
+
+def load_attempt_questions(layout):
+    question_ids = layout[::2]
+    questions = Question.query.filter(Question.id.in_(question_ids)).all()
+    by_id = {question.id: question for question in questions}
+    attempt = []
+    for question_id, order_index in zip(question_ids, layout[1::2]):
+        question = by_id.get(question_id)
+        if question is None:
+            continue
+        order = OPTION_ORDERS[order_index]
+        options = [getattr(question, f'option{original}') for original in order]
+        attempt.append((question, order, options))
+    return attempt
+
+def grade(attempt, answers):
+    score = 0
+    for question, order, _ in attempt:
+        answer = answers.get(f'question_{question.id}')
+        if answer and answer.isdigit() and 1 <= int(answer) <= len(order):
+            if order[int(answer) - 1] == question.correct_option:
+                score += 1
+    return score
@@ -0,0 +1,179 @@
+import csv
+import os
+from datetime import datetime, timedelta
+from importlib.util import find_spec
+from flask import current_app
+from app import db
+from app.background import submit
+from app.models.quiz import Quiz
+from app.models.report_job import ReportJob
+from app.models.score import Score
+from app.models.user import User
+
+# Every report is read in keyset pages ("key > last key ORDER BY key LIMIT n")
+# so memory stays at one chunk and no read transaction stays open while the
+# job commits its progress.
+
+def _scores_report(job):
+    header = ("score_id", "username", "fullname", "quiz", "attempt", "total_scored", "timestamp")
+    query = (
+        db.select(Score.id, User.username, User.fullname, Quiz.name, Score.attempt_number,
+                  Score.total_scored, Score.timestamp)
+        .join(User, Score.user_id == User.id)
+        .join(Quiz, Score.quiz_id == Quiz.id)
+    )
+    if job.quiz_id:
+        query = query.where(Score.quiz_id == job.quiz_id)
+    if job.user_id:
+        query = query.where(Score.user_id == job.user_id)
+    return header, query, Score.id
+
+def _users_report(job):
+    header = ("user_id", "username", "fullname", "qualification", "dob")
+    query = (
+        db.select(User.id, User.username, User.fullname, User.qualification, User.dob)
+        .where(User.is_admin.isnot(True))
+    )
+    if job.user_id:
+        query = query.where(User.id == job.user_id)
+    return header, query, User.id
+
+def _quiz_results_report(job):
+    header = ("user_id", "username", "fullname", "attempts", "best_score", "last_attempted")
+    query = (
+        db.select(User.id, User.username, User.fullname, db.func.count(Score.id),
+                  db.func.max(Score.total_scored), db.func.max(Score.timestamp))
+        .join(Score, Score.user_id == User.id)
+        .where(Score.quiz_id == job.quiz_id)
+        .group_by(User.id, User.username, User.fullname)
+    )
+    return header, query, User.id
+
+REPORT_QUERIES = {
+    "scores": _scores_report,
+    "users": _users_report,
+    "quiz_results": _quiz_results_report,
+}
+
+def _chunks(query, key, chunk_size):
+    last_key = None
+    while True:
+        page = query.order_by(key).limit(chunk_size)
+        if last_key is not None:
+            page = page.where(key > last_key)
+        rows = db.session.execute(page).all()
+        db.session.rollback()
+        if not rows:
+            return
+        yield rows
+        last_key = rows[-1][0]
+
+class _CsvWriter:
+    def __init__(self, path):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+
+    def write(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+class _XlsxWriter:
+    def __init__(self, path):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise RuntimeError("XLSX exports need the openpyxl package")
+        # write_only workbooks stream rows to disk instead of keeping cells
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+
+    def write(self, row):
+        self.sheet.append(tuple(row))
+
+    def close(self):
+        self.workbook.save(self.path)
+
+WRITERS = {"csv": _CsvWriter, "xlsx": _XlsxWriter}
+
+def available_formats():
+    formats = [("csv", "CSV")]
+    if find_spec("openpyxl") is not None:
+        formats.append(("xlsx", "Excel (XLSX)"))
+    return formats
+
+def _count(query):
+    return db.session.execute(db.select(db.func.count()).select_from(query.subquery())).scalar_one()
+
+def run_report(job_id):
+    # Claim the job atomically so a requeued job never runs twice at once
+    claimed = db.session.execute(
+        db.update(ReportJob)
+        .where(ReportJob.id == job_id, ReportJob.status == "queued")
+        .values(status="running", rows_written=0, updated_at=datetime.now())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        return
+    job = db.session.get(ReportJob, job_id)
+
+    reports_dir = current_app.config["REPORTS_DIR"]
+    os.makedirs(reports_dir, exist_ok=True)
+    path = os.path.join(reports_dir, f"{job.kind}-{job.id}.{job.format}")
+    partial_path = path + ".part"
+    chunk_size = current_app.config.get("REPORT_CHUNK_SIZE", 5000)
+    try:
+        header, query, key = REPORT_QUERIES[job.kind](job)
+        job.total_rows = _count(query)
+        db.session.commit()
+        writer = WRITERS[job.format](partial_path)
+        try:
+            writer.write(header)
+            for rows in _chunks(query, key, chunk_size):
+                for row in rows:
+                    writer.write(row)
+                job.rows_written += len(rows)
+                db.session.commit()
+        finally:
+            writer.close()
+        os.replace(partial_path, path)
+        job.file_path = path
+        job.status = "done"
+    except Exception as error:
+        db.session.rollback()
+        job.status = "failed"
+        job.error = str(error)
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    job.finished_at = datetime.now()
+    db.session.commit()
+
+def request_report(kind, format, requested_by, quiz_id=None, user_id=None):
+    job = ReportJob(kind=kind, format=format, requested_by=requested_by, quiz_id=quiz_id, user_id=user_id)
+    db.session.add(job)
+    db.session.commit()
+    submit(current_app._get_current_object(), run_report, job.id)
+    return job
+
+def requeue_stale_reports():
+    cutoff = datetime.now() - timedelta(seconds=current_app.config.get("REPORT_STALE_AFTER", 600))
+    requeued = db.session.execute(
+        db.update(ReportJob)
+        .where(ReportJob.status == "running", ReportJob.updated_at < cutoff)
+        .values(status="queued")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return requeued
+
+def run_pending_reports():
+    requeue_stale_reports()
+    job_ids = db.session.execute(
+        db.select(ReportJob.id).where(ReportJob.status == "queued").order_by(ReportJob.id)
+    ).scalars().all()
+    for job_id in job_ids:
+        run_report(job_id)
+    return len(job_ids)
@@ -0,0 +1,158 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import time
+from functools import wraps
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from flask import g, has_request_context, request
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+access_logger = logging.getLogger("quiz_master.access")
+audit_logger = logging.getLogger("quiz_master.audit")
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, default=str)
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _remove_old_logs(log_dir, filename, retention_days):
+    # Per-worker files outlive their worker; once a dead worker's files have
+    # not been written to for LOG_RETENTION_DAYS they are removed, so
+    # recycled and autoscaled workers don't fill LOG_DIR.
+    if "{pid}" not in filename or not retention_days:
+        return
+    pattern = re.compile(re.escape(filename).replace(re.escape("{pid}"), r"(\d+)") + r"(\.\d+)?$")
+    cutoff = time.time() - retention_days * 86400
+    for name in os.listdir(log_dir):
+        match = pattern.match(name)
+        if not match or _pid_alive(int(match.group(1))):
+            continue
+        path = os.path.join(log_dir, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+def _file_handler(app, filename):
+    log_dir = app.config["LOG_DIR"]
+    os.makedirs(log_dir, exist_ok=True)
+    _remove_old_logs(log_dir, filename, app.config.get("LOG_RETENTION_DAYS", 7))
+    handler = RotatingFileHandler(
+        os.path.join(log_dir, filename.format(pid=os.getpid())),
+        maxBytes=app.config.get("LOG_MAX_BYTES", 10 * 1024 * 1024),
+        backupCount=app.config.get("LOG_BACKUP_COUNT", 5),
+        encoding="utf-8"
+    )
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+def _current_user_id():
+    return current_user.get_id() if current_user and current_user.is_authenticated else None
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "_query_count" in g:
+        g._query_count += 1
+
+def _start_request():
+    g._request_started = time.perf_counter()
+    g._query_count = 0
+
+def _log_request(app):
+    sample_rate = app.config.get("ACCESS_LOG_SAMPLE_RATE", 1.0)
+    slow_ms = app.config.get("ACCESS_LOG_SLOW_MS", 500)
+
+    def log_request(response):
+        if "_request_started" not in g:
+            return response
+        duration_ms = (time.perf_counter() - g._request_started) * 1000
+        # Errors and slow requests are always kept, the rest is sampled.
+        if response.status_code < 500 and duration_ms < slow_ms and random.random() >= sample_rate:
+            return response
+        access_logger.info("request", extra={"fields": {
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "duration_ms": round(duration_ms, 2),
+            "queries": g._query_count,
+            "user_id": _current_user_id(),
+            "remote_addr": request.remote_addr,
+        }})
+        return response
+    return log_request
+
+def init_logging(app):
+    if not app.config.get("STRUCTURED_LOGGING"):
+        return
+    # Request threads only put records on an in-memory queue; a single
+    # listener thread per process formats them and does the file I/O.
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(
+        log_queue,
+        _file_handler(app, app.config.get("ACCESS_LOG_FILE", "access-{pid}.log")),
+        _file_handler(app, app.config.get("AUDIT_LOG_FILE", "audit-{pid}.log")),
+        respect_handler_level=True
+    )
+    access_handler, audit_handler = listener.handlers
+    access_handler.addFilter(lambda record: record.name == access_logger.name)
+    audit_handler.addFilter(lambda record: record.name == audit_logger.name)
+    for logger in (access_logger, audit_logger):
+        logger.handlers = [QueueHandler(log_queue)]
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    listener.start()
+    atexit.register(listener.stop)
+    app.extensions["log_listener"] = listener
+
+    if not event.contains(Engine, "after_cursor_execute", _count_query):
+        event.listen(Engine, "after_cursor_execute", _count_query)
+    app.before_request(_start_request)
+    app.after_request(_log_request(app))
+
+def audit(action, **fields):
+    audit_logger.info(action, extra={"fields": dict(fields, action=action, user_id=_current_user_id())})
+
+def mark_audit_succeeded():
+    # Audited views call this once the action has actually been carried out;
+    # error paths redirect too, so the status code can't tell them apart.
+    g.audit_succeeded = True
+
+def audited(action):
+    def decorator(func):
+        @wraps(func)
+        def decorated_view(*args, **kwargs):
+            g.audit_succeeded = False
+            response = func(*args, **kwargs)
+            if request.method == "POST":
+                audit(
+                    action,
+                    target=kwargs or None,
+                    ids=request.form.getlist("ids") or None,
+                    succeeded=g.pop("audit_succeeded", False),
+                    remote_addr=request.remote_addr
+                )
+            return response
+        return decorated_view
+    return decorator
@@ -0,0 +1,102 @@
+import os
+import time
+from threading import Lock
+from flask import Response, current_app, g, render_template, stream_template, before_render_template, template_rendered
+from jinja2 import FileSystemBytecodeCache, ModuleLoader, TemplateNotFound
+
+class PrecompiledLoader(ModuleLoader):
+    # Serves a module from `flask templates compile` only while it is newer
+    # than its source; an edited template falls through to the source loader
+    # until the next compile instead of serving the stale module.
+    def __init__(self, path, source_loader):
+        super().__init__(path)
+        self.path = path
+        self.source_loader = source_loader
+
+    def load(self, environment, name, globals=None):
+        module_path = os.path.join(self.path, self.get_module_filename(name))
+        try:
+            _, source_path, _ = self.source_loader.get_source(environment, name)
+        except TemplateNotFound:
+            source_path = None
+        if not os.path.exists(module_path) or (
+            source_path and os.path.getmtime(source_path) > os.path.getmtime(module_path)
+        ):
+            raise TemplateNotFound(name)
+        return super().load(environment, name, globals)
+
+class TemplateStats:
+    def __init__(self):
+        self.lock = Lock()
+        self.templates = {}
+
+    def record(self, name, elapsed):
+        with self.lock:
+            stats = self.templates.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["count"] += 1
+            stats["total_ms"] += elapsed
+            stats["max_ms"] = max(stats["max_ms"], elapsed)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: dict(stats, avg_ms=stats["total_ms"] / stats["count"])
+                for name, stats in self.templates.items()
+            }
+
+def _start_render(app, template, **extra):
+    g.setdefault("_template_timers", []).append(time.perf_counter())
+
+def _finish_render(app, template, **extra):
+    timers = g.get("_template_timers")
+    if not timers:
+        return
+    elapsed = (time.perf_counter() - timers.pop()) * 1000
+    app.extensions["template_stats"].record(template.name, elapsed)
+    app.logger.debug("Rendered %s in %.2f ms", template.name, elapsed)
+
+def prewarm_templates(app):
+    names = app.create_global_jinja_loader().list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return names
+
+def init_templating(app):
+    # Must run before anything touches app.jinja_env, which is created once.
+    cache_dir = app.config.get("TEMPLATE_BYTECODE_CACHE_DIR")
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Entries are keyed by template name and checked against a checksum of
+        # the source, so edited templates are recompiled automatically and
+        # every worker pointing at the directory shares the compiled code.
+        app.jinja_options = dict(app.jinja_options, bytecode_cache=FileSystemBytecodeCache(cache_dir))
+
+    if app.config.get("TEMPLATE_PROFILING"):
+        app.extensions["template_stats"] = TemplateStats()
+        before_render_template.connect(_start_render, app)
+        template_rendered.connect(_finish_render, app)
+
+    if app.config.get("TEMPLATE_PREWARM"):
+        prewarm_templates(app)
+
+def _buffered(chunks, size):
+    buffer = []
+    buffered = 0
+    try:
+        for chunk in chunks:
+            buffer.append(chunk)
+            buffered += len(chunk)
+            if buffered >= size:
+                yield "".join(buffer)
+                buffer = []
+                buffered = 0
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        chunks.close()
+
+def render_streamed(template_name, **context):
+    if not current_app.config.get("STREAM_TEMPLATES"):
+        return render_template(template_name, **context)
+    chunks = stream_template(template_name, **context)
+    return Response(_buffered(chunks, current_app.config.get("STREAM_BUFFER_SIZE", 8192)))
@@ -0,0 +1,106 @@
+import os
+import subprocess
+import sys
+
+# Usage: python -m config.benchmark [runs]
+# Spawns fresh interpreters so every measurement is a real cold start.
+
+FIRST_REQUEST_SCRIPT = """
+import time
+start = time.perf_counter()
+import run
+imported = time.perf_counter()
+response = run.app.test_client().get('/login')
+done = time.perf_counter()
+print(imported - start, done - imported, done - start, response.status_code)
+"""
+
+# -X importtime only reports import statements, not importlib.import_module(),
+# which is how create_app loads the models and controllers. Those calls are
+# timed here directly, tagged with the phase (startup or first request).
+DYNAMIC_IMPORTS_SCRIPT = """
+import importlib
+import sys
+import time
+original_import_module = importlib.import_module
+phase = 'startup'
+
+def timed_import_module(name, package=None):
+    already_loaded = name in sys.modules
+    start = time.perf_counter()
+    module = original_import_module(name, package)
+    if not already_loaded:
+        print(phase, (time.perf_counter() - start) * 1000, name)
+    return module
+
+importlib.import_module = timed_import_module
+import run
+phase = 'first-request'
+run.app.test_client().get('/login')
+"""
+
+def first_request_timings(env, runs):
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', FIRST_REQUEST_SCRIPT],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout.split()
+        results.append([float(value) for value in output[:3]])
+    return [min(column) for column in zip(*results)]
+
+def import_costs(env):
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import run'],
+        env=env, capture_output=True, text=True, check=True
+    ).stderr
+    costs = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        costs.append((int(cumulative_us), int(self_us), name.strip()))
+    costs.sort(reverse=True)
+    return costs
+
+def dynamic_import_costs(env):
+    stdout = subprocess.run(
+        [sys.executable, '-c', DYNAMIC_IMPORTS_SCRIPT],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    costs = []
+    for line in stdout.splitlines():
+        phase, elapsed_ms, name = line.split()
+        costs.append((phase, float(elapsed_ms), name))
+    return costs
+
+def report(label, env, runs):
+    import_time, first_request, total = first_request_timings(env, runs)
+    print(f"== {label} ==")
+    print(f"import run:        {import_time * 1000:8.1f} ms")
+    print(f"first request:     {first_request * 1000:8.1f} ms")
+    print(f"time to first req: {total * 1000:8.1f} ms")
+    costs = import_costs(env)
+    own = [cost for cost in costs if cost[2].split('.')[0] in ('run', 'app', 'config')]
+    print("slowest imports (cumulative / self, ms):")
+    for cumulative_us, self_us, name in costs[:10]:
+        print(f"  {cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {name}")
+    print("project modules (cumulative / self, ms):")
+    for cumulative_us, self_us, name in own:
+        print(f"  {cumulative_us / 1000:8.1f} {self_us / 1000:8.1f}  {name}")
+    print("modules loaded through import_module (cumulative ms):")
+    for phase, elapsed_ms, name in dynamic_import_costs(env):
+        print(f"  {elapsed_ms:8.1f}  {name:<40} {phase}")
+    print()
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    base_env = dict(os.environ)
+    base_env.setdefault('SECRET_KEY', 'benchmark')
+    base_env.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite://')
+
+    report('eager', dict(base_env, LAZY_LOADING='false'), runs)
+    report('lazy', dict(base_env, LAZY_LOADING='true'), runs)
+
+if __name__ == "__main__":
+    main()
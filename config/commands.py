@@ -1,9 +1,10 @@
 import os
-from app import db
-from config.seed import seed_database
-from app.models.user import User
+import click
+from sqlalchemy import inspect
+from app import db, load_models
 
 def create_admin():
+    from app.models.user import User
     admin = User.query.filter_by(username=os.getenv('ADMIN_USERNAME')).first()
     if not admin:
         admin = User(
@@ -19,6 +20,76 @@ def create_admin():
         print("Admin already exists!")
 
 
+def number_attempts():
+    from app.models.score import Score
+
+    # Number every user's attempts at a quiz in timestamp order (id breaks ties)
+    score = Score.__table__
+    ranked = db.select(
+        score.c.id,
+        db.func.row_number().over(
+            partition_by=(score.c.user_id, score.c.quiz_id),
+            order_by=(score.c.timestamp, score.c.id)
+        ).label('attempt_number')
+    ).subquery()
+    result = db.session.execute(
+        score.update().values(
+            attempt_number=db.select(ranked.c.attempt_number).where(ranked.c.id == score.c.id).scalar_subquery()
+        )
+    )
+    db.session.commit()
+    print(f"Numbered {result.rowcount} attempts")
+
+def _column_definition(column):
+    definition = column.type.compile(db.engine.dialect)
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        definition += f" DEFAULT {int(default) if isinstance(default, bool) else default!r}"
+        if not column.nullable:
+            definition += " NOT NULL"
+    return definition
+
+def upgrade_schema():
+    # Brings a database created by an older release up to the current models:
+    # new tables, new columns (ALTER TABLE ... ADD COLUMN with the model's
+    # scalar default) and missing indexes. Returns the (table, column) pairs
+    # that were added.
+    load_models()
+    db.create_all()
+    inspector = inspect(db.engine)
+    added = []
+    for table in db.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                db.session.execute(db.text(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column.name} {_column_definition(column)}"
+                ))
+                added.append((table.name, column.name))
+                print(f"Added {table.name}.{column.name}")
+    db.session.commit()
+    # Existing scores all defaulted to attempt 1, which the unique
+    # (user_id, quiz_id, attempt_number) index below would reject
+    if ('score', 'attempt_number') in added:
+        number_attempts()
+
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {constraint['name'] for constraint in inspector.get_unique_constraints(table.name)}
+        existing |= {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(db.engine)
+                print(f"Created index {index.name}")
+        # Tables created before a unique constraint existed get a unique
+        # index with the same name, which enforces the same rule.
+        for constraint in table.constraints:
+            if isinstance(constraint, db.UniqueConstraint) and constraint.name and constraint.name not in existing:
+                columns = ", ".join(column.name for column in constraint.columns)
+                db.session.execute(db.text(f"CREATE UNIQUE INDEX {constraint.name} ON {table.name} ({columns})"))
+                print(f"Created unique index {constraint.name}")
+    return added
+
 def register_commands(app):
     @app.cli.group('db')
     def db_group():
@@ -26,11 +97,103 @@ def register_commands(app):
 
     @db_group.command('create')
     def create_db():
+        load_models()
         db.create_all()
         create_admin()
         print("Database created!")
 
+    @db_group.command('upgrade')
+    def upgrade_db():
+        upgrade_schema()
+        db.session.commit()
+        print("Database upgraded!")
+
+    @db_group.command('number-attempts')
+    def number_attempts_command():
+        number_attempts()
+        print("Attempts numbered!")
+
     @db_group.command('seed')
     def seed_db():
+        from config.seed import seed_database
         seed_database()
-        print("Database seeded successfully!")
\ No newline at end of file
+        print("Database seeded successfully!")
+
+    @app.cli.group('progress')
+    def progress_group():
+        pass
+
+    @progress_group.command('rebuild')
+    @click.argument('user_ids', nargs=-1, type=int)
+    def rebuild_progress(user_ids):
+        from app.models.user import User
+        from app.progress import rebuild_all_progress
+        if not user_ids:
+            user_ids = db.session.execute(db.select(User.id).where(User.is_admin.isnot(True))).scalars().all()
+        rebuild_all_progress(user_ids)
+        print(f"Progress rebuilt for {len(user_ids)} users!")
+
+    @progress_group.command('refresh-stale')
+    def refresh_stale():
+        from app.progress import refresh_stale_progress
+        print(f"Progress refreshed for {refresh_stale_progress()} users!")
+
+    @app.cli.group('reports')
+    def reports_group():
+        pass
+
+    @reports_group.command('run-pending')
+    def run_pending():
+        from app.reports import run_pending_reports
+        print(f"Ran {run_pending_reports()} queued report jobs!")
+
+    @app.cli.group('bulk')
+    def bulk_group():
+        pass
+
+    @bulk_group.command('delete')
+    @click.argument('kind', type=click.Choice(['subjects', 'chapters', 'quizzes', 'users']))
+    @click.argument('ids', nargs=-1, type=int, required=True)
+    @click.option('--chunk-size', default=1000, show_default=True)
+    def bulk_delete(kind, ids, chunk_size):
+        from app.bulk import DELETERS
+
+        def progress(table, deleted):
+            print(f"  {table}: {deleted} rows deleted")
+
+        counts = DELETERS[kind](ids, chunk_size, progress)
+        print("Deleted " + ", ".join(f"{count} {table}" for table, count in counts.items()) + "!")
+
+    @bulk_group.command('run-pending')
+    def run_pending_bulk():
+        from app.bulk import run_pending_bulk_jobs
+        print(f"Ran {run_pending_bulk_jobs()} queued bulk jobs!")
+
+    @bulk_group.command('move')
+    @click.argument('kind', type=click.Choice(['chapters', 'quizzes']))
+    @click.argument('ids', nargs=-1, type=int, required=True)
+    @click.option('--to', 'target_id', type=int, required=True, help='Target subject (chapters) or chapter (quizzes) id')
+    @click.option('--chunk-size', default=1000, show_default=True)
+    def bulk_move(kind, ids, target_id, chunk_size):
+        from app.bulk import MOVERS
+        mover, parent_model = MOVERS[kind]
+        if db.session.get(parent_model, target_id) is None:
+            print(f"No {parent_model.__tablename__} with id {target_id}!")
+            return
+        print(f"Moved {mover(ids, target_id, chunk_size)} {kind}!")
+
+    @app.cli.group('templates')
+    def templates_group():
+        pass
+
+    @templates_group.command('compile')
+    @click.argument('target', required=False)
+    def compile_templates(target):
+        target = target or app.config.get('PRECOMPILED_TEMPLATES_DIR')
+        if not target:
+            print("No target directory given and PRECOMPILED_TEMPLATES_DIR is not set!")
+            return
+        os.makedirs(target, exist_ok=True)
+        env = app.jinja_env.overlay(loader=app.create_global_jinja_loader())
+        env.compile_templates(target, zip=None, ignore_errors=False)
+        print(f"Templates compiled to {target}!")
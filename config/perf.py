@@ -0,0 +1,238 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+# Usage: python -m config.perf [sizes]   e.g. python -m config.perf 20,80,200
+# Builds a fixture database at every size, requests each route and fails
+# (exit status 1) when a route issues more SQL statements than its budget,
+# when its statement count grows with the data, or when the largest fixture
+# exceeds its wall-clock budget.
+
+DEFAULT_SIZES = (20, 80, 200)
+PASSWORD = "password1"
+
+# (name, role, method, path, max statements, scales with data, budget in ms)
+# Statement counts include Flask-Login loading the current user.
+ROUTES = [
+    ("home", None, "GET", "/", 0, False, 100),
+    ("login form", None, "GET", "/login", 0, False, 100),
+    ("register form", None, "GET", "/register", 0, False, 100),
+    ("login", None, "POST", "/login", 1, False, 1000),
+    ("user dashboard", "user", "GET", "/dashboard", 6, False, 300),
+    ("select quiz", "user", "GET", "/select-quiz", 6, False, 300),
+    ("leaderboard", "user", "GET", "/leaderboard", 2, False, 300),
+    ("attempt quiz", "user", "GET", "/attempt_quiz/1", 9, False, 300),
+    ("submit quiz", "user", "POST", "/attempt_quiz/1", 12, False, 500),
+    ("quiz results", "user", "GET", "/quiz_results/1", 4, False, 300),
+    ("admin dashboard", "admin", "GET", "/admin/dashboard", 4, False, 300),
+    ("manage subjects", "admin", "GET", "/admin/manage_subjects", 2, False, 300),
+    ("manage chapters", "admin", "GET", "/admin/manage_chapters", 3, False, 300),
+    ("manage quizzes", "admin", "GET", "/admin/manage_quizzes", 3, False, 300),
+    ("manage users", "admin", "GET", "/admin/manage_users", 2, False, 500),
+    ("manage quiz questions", "admin", "GET", "/admin/manage_quiz_questions/1", 3, False, 300),
+    ("reports", "admin", "GET", "/admin/reports", 3, False, 300),
+    ("add subject", "admin", "POST", "/admin/add_subject", 3, False, 300),
+    ("edit subject", "admin", "POST", "/admin/edit_subject/1", 4, False, 300),
+    ("add chapter", "admin", "POST", "/admin/add_chapter", 4, False, 300),
+    ("edit chapter", "admin", "POST", "/admin/edit_chapter/1", 5, False, 300),
+    ("add quiz", "admin", "POST", "/admin/add_quiz", 4, False, 300),
+    ("edit quiz", "admin", "POST", "/admin/edit_quiz/1", 5, False, 300),
+    ("add question", "admin", "POST", "/admin/add_question/1", 3, False, 300),
+    ("move quizzes", "admin", "POST", "/admin/bulk_move/quizzes", 6, False, 500),
+    ("move chapters", "admin", "POST", "/admin/bulk_move/chapters", 6, False, 500),
+    ("delete quiz", "admin", "POST", "/admin/delete_quiz/2", 5, False, 500),
+    ("bulk delete quizzes", "admin", "POST", "/admin/bulk_delete/quizzes", 4, False, 500),
+    # Deletes only queue a background job; the cascade itself is not counted.
+    ("delete chapter", "admin", "POST", "/admin/delete_chapter/4", 5, False, 500),
+    ("delete subject", "admin", "POST", "/admin/delete_subject/2", 5, False, 500),
+    ("bulk delete users", "admin", "POST", "/admin/bulk_delete/users", 4, False, 500),
+    ("request report", "admin", "POST", "/admin/reports", 5, False, 300),
+]
+
+# Form data posted by the admin routes above; the quiz submission reads its
+# idempotency key from the attempt page instead.
+FORM_DATA = {
+    "add subject": {"name": "Perf Subject", "description": ""},
+    "edit subject": {"name": "Subject 0", "description": "Edited"},
+    "add chapter": {"name": "Perf Chapter", "description": "", "subject_id": 1},
+    "edit chapter": {"name": "Chapter 0", "description": "Edited", "subject_id": 1},
+    "add quiz": {"name": "Perf Quiz", "date_of_quiz": "2024-01-01T10:00", "time_duration": 600, "chapter_id": 1},
+    "edit quiz": {"name": "Quiz 0", "date_of_quiz": "2024-01-01T10:00", "time_duration": 600, "chapter_id": 1},
+    "add question": {"question_statement": "Perf question", "option1": "a", "option2": "b", "option3": "c",
+                     "option4": "d", "correct_option": 1},
+    "move quizzes": {"ids": [5, 6], "target_id": 2},
+    "move chapters": {"ids": [3], "target_id": 1},
+    "bulk delete quizzes": {"ids": [3, 4]},
+    "bulk delete users": {"ids": [3]},
+    "request report": {"kind": "users", "format": "csv", "quiz_id": 0},
+}
+
+def configure_environment(directory):
+    # Everything the run writes (database, exports, logs, caches) stays
+    # under the given directory.
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(directory, 'perf.db')}"
+    os.environ["REPORTS_DIR"] = os.path.join(directory, "reports")
+    os.environ["LOG_DIR"] = os.path.join(directory, "logs")
+    os.environ["CACHE_URL"] = os.path.join(directory, "cache.db")
+    os.environ["RATE_LIMIT_SQLITE_PATH"] = os.path.join(directory, "rate_limits.db")
+    os.environ.setdefault("SECRET_KEY", "perf")
+    # Measure the routes themselves: no caching, rate limiting or log files,
+    # and background work (progress refreshes) counted where it happens.
+    os.environ["CACHE_BACKEND"] = "null"
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ["STRUCTURED_LOGGING"] = "false"
+    os.environ["BACKGROUND_JOBS_SYNC"] = "false"
+    os.environ["LAZY_LOADING"] = "false"
+
+def build_fixture(size):
+    from werkzeug.security import generate_password_hash
+    from app import db
+    from app.models.chapter import Chapter
+    from app.models.question import Question
+    from app.models.quiz import Quiz
+    from app.models.score import Score
+    from app.models.subject import Subject
+    from app.models.user import User
+    from app.models.user_progress import UserProgress
+    from app.progress import refresh_user_progress
+
+    db.drop_all()
+    db.create_all()
+    password_hash = generate_password_hash(PASSWORD)
+    quiz_count = max(size // 2, 2)
+
+    users = [{"id": 1, "username": "admin@example.com", "fullname": "Admin", "is_admin": True,
+              "password_hash": password_hash}]
+    users += [
+        {"id": i + 2, "username": f"user{i}@example.com", "fullname": f"User {i}", "qualification": "B.Sc",
+         "dob": datetime(2000, 1, 1), "is_admin": False, "password_hash": password_hash}
+        for i in range(size)
+    ]
+    subjects = [{"id": i + 1, "name": f"Subject {i}", "description": ""} for i in range(2)]
+    chapters = [{"id": i + 1, "name": f"Chapter {i}", "description": "", "subject_id": i % 2 + 1} for i in range(4)]
+    quizzes = [
+        {"id": i + 1, "name": f"Quiz {i}", "date_of_quiz": datetime(2024, 1, 1), "time_duration": 600,
+         "chapter_id": i % 4 + 1, "pool_size": 0, "max_attempts": 0}
+        for i in range(quiz_count)
+    ]
+    questions = [
+        {"question_statement": f"Question {q}.{n}", "option1": "a", "option2": "b", "option3": "c",
+         "option4": "d", "correct_option": 1, "quiz_id": q + 1}
+        for q in range(quiz_count) for n in range(4)
+    ]
+    # Every user has attempted every quiz except the first, which the
+    # measured user attempts during the run.
+    scores = [
+        {"user_id": user["id"], "quiz_id": quiz["id"], "total_scored": (user["id"] + quiz["id"]) % 5,
+         "attempt_number": 1, "timestamp": datetime(2024, 1, 2)}
+        for user in users[1:] for quiz in quizzes[1:]
+    ]
+    for model, rows in ((User, users), (Subject, subjects), (Chapter, chapters), (Quiz, quizzes),
+                        (Question, questions), (Score, scores)):
+        db.session.execute(db.insert(model), rows)
+    # Every user has a progress row for the deletes and moves to mark stale;
+    # the measured user's is filled in so the dashboard has data to render.
+    db.session.execute(db.insert(UserProgress), [{"user_id": user["id"]} for user in users[1:]])
+    db.session.commit()
+    refresh_user_progress(users[1]["id"])
+
+class StatementCounter:
+    # Only statements issued by the thread serving the request are counted,
+    # not those of background jobs it queued.
+    def __init__(self):
+        self.count = 0
+        self.thread = threading.get_ident()
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == self.thread:
+            self.count += 1
+
+def _login(app, username):
+    client = app.test_client()
+    client.post("/login", data={"username": username, "password": PASSWORD})
+    return client
+
+def _submit_data(client, path):
+    import re
+    page = client.get(path).get_data(as_text=True)
+    match = re.search(r'name="idempotency_key" value="(\w+)"', page)
+    return {"idempotency_key": match.group(1)} if match else {}
+
+def measure(app, counter, size):
+    from app import db
+    from app.background import shutdown
+    with app.app_context():
+        build_fixture(size)
+        db.session.remove()
+
+    clients = {
+        None: app.test_client(),
+        "user": _login(app, "user0@example.com"),
+        "admin": _login(app, "admin@example.com"),
+    }
+    results = {}
+    for name, role, method, path, _, _, _ in ROUTES:
+        client = clients[role]
+        data = None
+        if method == "POST" and path == "/login":
+            data = {"username": "user1@example.com", "password": PASSWORD}
+            client = app.test_client()
+        elif method == "POST":
+            data = FORM_DATA.get(name) or _submit_data(client, path)
+        counter.count = 0
+        started = time.perf_counter()
+        response = client.open(path, method=method, data=data)
+        response.get_data()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        results[name] = (counter.count, elapsed_ms, response.status_code)
+    # Let queued progress refreshes and reports finish before the next
+    # fixture drops their tables.
+    shutdown()
+    return results
+
+def check(sizes):
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from run import app
+
+    app.config["WTF_CSRF_ENABLED"] = False
+    counter = StatementCounter()
+    event.listen(Engine, "after_cursor_execute", counter)
+
+    by_size = {size: measure(app, counter, size) for size in sizes}
+    failures = []
+    print(f"{'route':<24}" + "".join(f"{f'n={size}':>14}" for size in sizes) + f"{'budget':>18}")
+    for name, _, _, _, max_queries, scales, budget_ms in ROUTES:
+        counts = [by_size[size][name][0] for size in sizes]
+        timings = [by_size[size][name][1] for size in sizes]
+        statuses = {by_size[size][name][2] for size in sizes}
+        cells = "".join(f"{count:>5} q {elapsed:>5.0f}ms" for count, elapsed in zip(counts, timings))
+        print(f"{name:<24}{cells}{max_queries:>7} q {budget_ms:>5}ms")
+
+        if any(status >= 400 for status in statuses):
+            failures.append(f"{name}: HTTP {sorted(statuses)}")
+        if max(counts) > max_queries:
+            failures.append(f"{name}: {max(counts)} SQL statements, budget is {max_queries}")
+        if not scales and len(set(counts)) > 1:
+            failures.append(f"{name}: statement count grows with data size {counts}")
+        if timings[-1] > budget_ms:
+            failures.append(f"{name}: {timings[-1]:.0f} ms at n={sizes[-1]}, budget is {budget_ms} ms")
+    return failures
+
+def main():
+    sizes = tuple(int(size) for size in sys.argv[1].split(",")) if len(sys.argv) > 1 else DEFAULT_SIZES
+    with tempfile.TemporaryDirectory() as directory:
+        configure_environment(directory)
+        failures = check(sizes)
+    if failures:
+        print("\nFAILED")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nAll routes within budget.")
+
+if __name__ == "__main__":
+    main()
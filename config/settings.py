@@ -4,3 +4,80 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY')
     SQLALCHEMY_DATABASE_URI = os.getenv('SQLALCHEMY_DATABASE_URI')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Defer controller, model and form imports until the first request
+    LAZY_LOADING = os.getenv('LAZY_LOADING', 'false').lower() == 'true'
+    # Directory written by `flask templates compile`; used when it exists.
+    # A template edited after the compile is served from its source until
+    # the next compile
+    PRECOMPILED_TEMPLATES_DIR = os.getenv('PRECOMPILED_TEMPLATES_DIR')
+
+    # Compiled template bytecode shared by every worker using the directory
+    TEMPLATE_BYTECODE_CACHE_DIR = os.getenv('TEMPLATE_BYTECODE_CACHE_DIR')
+    TEMPLATE_PREWARM = os.getenv('TEMPLATE_PREWARM', 'false').lower() == 'true'
+    TEMPLATE_PROFILING = os.getenv('TEMPLATE_PROFILING', 'false').lower() == 'true'
+    # Send large pages (manage users, leaderboard) while they are rendered
+    STREAM_TEMPLATES = os.getenv('STREAM_TEMPLATES', 'false').lower() == 'true'
+    STREAM_BUFFER_SIZE = int(os.getenv('STREAM_BUFFER_SIZE', 8192))
+
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    # 'memory' keeps buckets per process, 'sqlite' shares them between workers
+    RATE_LIMIT_STORAGE = os.getenv('RATE_LIMIT_STORAGE', 'memory')
+    RATE_LIMIT_SQLITE_PATH = os.getenv('RATE_LIMIT_SQLITE_PATH', 'instance/rate_limits.db')
+    # Upper bound on in-memory buckets per worker; least recently used go first
+    RATE_LIMIT_MAX_BUCKETS = int(os.getenv('RATE_LIMIT_MAX_BUCKETS', 100000))
+    # Token buckets per endpoint: (capacity, seconds to refill it completely)
+    RATE_LIMITS = {
+        'auth.login': {'ip': (20, 60), 'user': (5, 60)},
+        'auth.register': {'ip': (5, 300)},
+        'users.attempt_quiz': {'ip': (60, 60), 'user': (10, 60)},
+    }
+    # Concurrent login/register/submit requests per worker; extra requests
+    # wait up to the timeout (seconds, 0 to reject immediately)
+    MAX_CONCURRENT_HEAVY_REQUESTS = int(os.getenv('MAX_CONCURRENT_HEAVY_REQUESTS', 8))
+    HEAVY_REQUEST_QUEUE_TIMEOUT = float(os.getenv('HEAVY_REQUEST_QUEUE_TIMEOUT', 2))
+
+    # Thread pool for work done after the response (progress refreshes)
+    BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', 2))
+    BACKGROUND_JOBS_SYNC = os.getenv('BACKGROUND_JOBS_SYNC', 'false').lower() == 'true'
+
+    # JSON access and admin audit logs, written off the request thread
+    STRUCTURED_LOGGING = os.getenv('STRUCTURED_LOGGING', 'true').lower() == 'true'
+    LOG_DIR = os.getenv('LOG_DIR', 'instance/logs')
+    # '{pid}' gives every worker process its own file: RotatingFileHandler
+    # can't safely rotate a file that other processes are writing to
+    ACCESS_LOG_FILE = os.getenv('ACCESS_LOG_FILE', 'access-{pid}.log')
+    AUDIT_LOG_FILE = os.getenv('AUDIT_LOG_FILE', 'audit-{pid}.log')
+    LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+    # Files of exited workers are deleted by the next worker to start once
+    # they are this many days old; 0 keeps them
+    LOG_RETENTION_DAYS = float(os.getenv('LOG_RETENTION_DAYS', 7))
+    # Fraction of ordinary requests logged; errors and slow requests always are
+    ACCESS_LOG_SAMPLE_RATE = float(os.getenv('ACCESS_LOG_SAMPLE_RATE', 1.0))
+    ACCESS_LOG_SLOW_MS = float(os.getenv('ACCESS_LOG_SLOW_MS', 500))
+
+    # Where export jobs write their files, and rows fetched per chunk
+    REPORTS_DIR = os.getenv('REPORTS_DIR', 'instance/reports')
+    REPORT_CHUNK_SIZE = int(os.getenv('REPORT_CHUNK_SIZE', 5000))
+    # Running jobs without progress for this many seconds are requeued by
+    # `flask reports run-pending`
+    REPORT_STALE_AFTER = int(os.getenv('REPORT_STALE_AFTER', 600))
+    # Same for bulk deletes started from the admin pages, requeued by
+    # `flask bulk run-pending`
+    BULK_STALE_AFTER = int(os.getenv('BULK_STALE_AFTER', 600))
+
+    # 'sqlite' (CACHE_URL is a file path shared by local workers), 'redis'
+    # (CACHE_URL is a redis:// URL), 'null', or 'memory' (per worker LRU; only
+    # safe with a single worker, since invalidations never reach the others)
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'sqlite')
+    CACHE_URL = os.getenv('CACHE_URL', 'instance/cache.db')
+    CACHE_KEY_PREFIX = os.getenv('CACHE_KEY_PREFIX', 'quiz_master')
+    CACHE_DEFAULT_TTL = int(os.getenv('CACHE_DEFAULT_TTL', 300))
+    # Upper bound on any entry's lifetime in the sqlite backend, including
+    # entries set with no TTL
+    CACHE_MAX_TTL = int(os.getenv('CACHE_MAX_TTL', 86400))
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 10000))
+    # Seconds a worker may keep using a namespace version before re-reading it
+    CACHE_VERSION_CHECK_INTERVAL = float(os.getenv('CACHE_VERSION_CHECK_INTERVAL', 1))
+    CACHE_LOCK_TIMEOUT = int(os.getenv('CACHE_LOCK_TIMEOUT', 10))
@@ -0,0 +1,7 @@
+from config.perf import DEFAULT_SIZES, check, configure_environment
+
+def test_route_budgets(tmp_path):
+    # configure_environment must run before check() first imports the app
+    configure_environment(str(tmp_path))
+    failures = check(DEFAULT_SIZES)
+    assert not failures, "\n".join(failures)